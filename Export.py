@@ -0,0 +1,255 @@
+#off-screen export of whole graph to PNG, not limited by window or screen size
+#graph is copied into columns (see GraphFile.GetColumns) when export starts, so it can be edited while export runs
+#image is split into tiles, figures of every tile are taken from the copy and tile is rendered in worker process
+#with the same code as window (Graph.Render), tiles are stitched into one image when it fits into QImage
+#or written as separate files (image_row_column.png)
+#numpy is optional - without it there is no export
+#  python Export.py graph.bin|file.csv|file.graphml image.png [--scale 2] [--tile 2048] [--workers 8] [--tiles]
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, floor
+from Utils import *
+from GraphObjects import *
+import GraphFile
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+available = np is not None
+
+#figures this close to tile are taken too - scaled pen reaches half of its width outside of figure bounds
+tileMargin = 1
+#biggest stitched image - QPainter coordinates are limited to 16 bits, QImage data to 2 GB
+maxStitchSide = 32767
+maxStitchBytes = 2 ** 31 - 1
+
+#tile grid covering image of graph - (row, column, world rect, size in pixels, offset in pixels) for every tile
+#tiles split image, not canvas - they are whole pixels, so neighbour tiles neither overlap nor leave seams at any scale
+#world rect covers all pixels of tile
+def GetTiles(width:int, height:int, scale:float, tileSize:int):
+    image_width = max(1, ceil(width * scale))
+    image_height = max(1, ceil(height * scale))
+    tiles = []
+    for row, top in enumerate(range(0, image_height, tileSize)):
+        bottom = min(top + tileSize, image_height)
+        for column, left in enumerate(range(0, image_width, tileSize)):
+            right = min(left + tileSize, image_width)
+            world_left = floor(left / scale)
+            world_top = floor(top / scale)
+            rect = (world_left, world_top, ceil(right / scale) - world_left, ceil(bottom / scale) - world_top)
+            tiles.append((row, column, rect, (right - left, bottom - top), (left, top)))
+    return tiles
+
+#copy of figures of graph taken once - all tiles are rendered from the same state of graph
+#nodes and links are in render order, links refer to nodes by index
+class GraphSnapshot:
+    def __init__(self, graph:Graph):
+        nodes, self.columns = GraphFile.GetColumns(graph)
+        columns = self.columns
+        self.highlightedNodes = np.fromiter((node in graph.highlightedNodes for node in nodes), bool, len(nodes))
+        self.highlightedLinks = np.fromiter((link in graph.highlightedLinks for link in graph.links), bool, len(columns['first']))
+        #link segments go between node centers (see Node.GetCenter)
+        center_x = columns['x'] + columns['width'] // 2
+        center_y = columns['y'] + columns['height'] // 2
+        first = columns['first']
+        second = columns['second']
+        self.linkLeft = np.minimum(center_x[first], center_x[second])
+        self.linkRight = np.maximum(center_x[first], center_x[second])
+        self.linkTop = np.minimum(center_y[first], center_y[second])
+        self.linkBottom = np.maximum(center_y[first], center_y[second])
+
+    #everything worker needs to render tile, figures are plain tuples - workers don't get graph itself
+    #nodes - (x, y, width, height, color index), links - indices of their nodes, highlighted - indices of nodes and links
+    def GetTileTask(self, rect:tuple[int, int, int, int], size:tuple[int, int], offset:tuple[int, int], scale:float, path:str, background:str):
+        columns = self.columns
+        area = (rect[0] - tileMargin, rect[1] - tileMargin, rect[2] + tileMargin * 2, rect[3] + tileMargin * 2)
+        right = area[0] + area[2]
+        bottom = area[1] + area[3]
+        #figures intersecting area - the same test as IsRectsIntersecting with bounds of figures (see GetBounds)
+        x = columns['x']
+        y = columns['y']
+        node_mask = (x < right) & (x + columns['width'] + 1 > area[0]) & (y < bottom) & (y + columns['height'] + 1 > area[1])
+        links = np.flatnonzero((self.linkLeft - 1 < right) & (self.linkRight + 2 > area[0]) &
+                               (self.linkTop - 1 < bottom) & (self.linkBottom + 2 > area[1]))
+        #ends of links crossing tile are needed for link geometry even when they are outside of it
+        node_mask[columns['first'][links]] = True
+        node_mask[columns['second'][links]] = True
+        nodes = np.flatnonzero(node_mask)
+        return {
+            'rect' : rect, 'area' : area, 'size' : size, 'offset' : offset, 'scale' : scale, 'path' : path, 'background' : background,
+            'nodes' : list(zip(*(columns[name][nodes].tolist() for name in ('x', 'y', 'width', 'height', 'color')))),
+            'links' : list(zip(np.searchsorted(nodes, columns['first'][links]).tolist(), np.searchsorted(nodes, columns['second'][links]).tolist())),
+            'highlightedNodes' : np.flatnonzero(self.highlightedNodes[nodes]).tolist(),
+            'highlightedLinks' : np.flatnonzero(self.highlightedLinks[links]).tolist(),
+        }
+
+#workers are spawned, not forked - forking process which runs Qt is not safe
+def InitWorker():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtGui import QGuiApplication
+    global application
+    if QGuiApplication.instance() == None:
+        application = QGuiApplication(sys.argv[:1])
+
+#body of worker - rebuilds figures of tile as small graph and renders it
+#returns pixels of tile when it is going to be stitched (no encoding and decoding of tile file), otherwise writes it to file
+def RenderTile(task:dict):
+    from PyQt5.QtGui import QColor, QImage, QPainter
+    left, top, width, height = task['area']
+    graph = Graph(left + width, top + height, False, False)
+    nodes = []
+    for x, y, node_width, node_height, color in task['nodes']:
+        node = Node(graph, node_width, node_height, color)
+        node.pos = Vector2d(x, y)
+        nodes.append(node)
+    graph.AddNodes(nodes)
+    links = [Link(nodes[first], nodes[second]) for first, second in task['links']]
+    graph.AddLinks(links)
+    if task['highlightedNodes'] or task['highlightedLinks']:
+        graph.SetHighlight([nodes[index] for index in task['highlightedNodes']], [links[index] for index in task['highlightedLinks']])
+
+    image = QImage(*task['size'], QImage.Format_ARGB32_Premultiplied)
+    image.fill(QColor(task['background']))
+    painter = QPainter(image)
+    #pixel of tile is pixel of whole image moved by offset of tile
+    painter.translate(-task['offset'][0], -task['offset'][1])
+    painter.scale(task['scale'], task['scale'])
+    graph.Render(painter, task['area'], task['scale'])
+    painter.end()
+    if task['path'] == None:
+        return image.bits().asstring(image.sizeInBytes())
+    if not image.save(task['path']):
+        raise OSError('Image is not saved: ' + task['path'])
+    return task['path']
+
+#exports graph in steps - tasks are prepared and handed to workers only as workers take them,
+#so ui can show progress (and stay responsive) between steps, see Step
+class ImageExport:
+    #tasks waiting in pool per worker - workers never wait for ui, ui doesn't prepare all tasks at once
+    queuedPerWorker = 2
+
+    #scale - image pixels per graph unit, tileSize - side of tile in pixels, workers - processes (all cores by default)
+    #stitch - write one image (if it fits into QImage) or only tiles
+    def __init__(self, graph:Graph, path:str, scale:float = 1, tileSize:int = 2048, workers:int = None, background:str = '#ffffff', stitch:bool = True):
+        self.snapshot = GraphSnapshot(graph)
+        self.path = path
+        self.scale = scale
+        self.background = background
+        self.workers = workers or os.cpu_count() or 1
+        self.tiles = GetTiles(graph.width, graph.height, scale, tileSize)
+        self.width = ceil(graph.width * scale)
+        self.height = ceil(graph.height * scale)
+        self.stitch = stitch and self.width <= maxStitchSide and self.height <= maxStitchSide and self.width * self.height * 4 <= maxStitchBytes
+        base = os.path.splitext(path)[0]
+        #tile files - written only when tiles are not stitched
+        self.tilePaths = [f'{base}_{row}_{column}.png' for row, column, rect, size, offset in self.tiles]
+        self.executor = ProcessPoolExecutor(self.workers, multiprocessing.get_context('spawn'), InitWorker)
+        #tile index -> future of tile which is not rendered or not stitched yet
+        self.pending = {}
+        self.submitted = 0
+        self.rendered = 0
+        #stitched image, tiles are drawn into it as they come and their pixels are dropped
+        self.image = None
+        self.finished = False
+        #files written by export - one image or tiles
+        self.files = []
+
+    def IsFinished(self):
+        return self.finished
+
+    #part of tiles rendered (0..1)
+    def GetProgress(self):
+        return self.rendered / len(self.tiles)
+
+    #hands next tasks to workers and takes rendered tiles, returns True when export is finished
+    def Step(self):
+        if self.finished:
+            return True
+        try:
+            self.TakeRendered()
+            while self.submitted < len(self.tiles) and len(self.pending) < self.workers * self.queuedPerWorker:
+                row, column, rect, size, offset = self.tiles[self.submitted]
+                task = self.snapshot.GetTileTask(rect, size, offset, self.scale, None if self.stitch else self.tilePaths[self.submitted], self.background)
+                self.pending[self.submitted] = self.executor.submit(RenderTile, task)
+                self.submitted += 1
+            if self.rendered < len(self.tiles):
+                return False
+            if self.stitch:
+                if not self.image.save(self.path):
+                    raise OSError('Image is not saved: ' + self.path)
+                self.files = [self.path]
+            else:
+                self.files = list(self.tilePaths)
+        except:
+            self.Close()
+            raise
+        self.Close()
+        return True
+
+    #stitches rendered tiles, errors of workers are raised here
+    def TakeRendered(self):
+        done = [index for index, future in self.pending.items() if future.done()]
+        if not done:
+            return
+        painter = None
+        if self.stitch:
+            from PyQt5.QtGui import QColor, QImage, QPainter
+            if self.image == None:
+                self.image = QImage(self.width, self.height, QImage.Format_ARGB32_Premultiplied)
+                self.image.fill(QColor(self.background))
+            painter = QPainter(self.image)
+        try:
+            for index in done:
+                result = self.pending.pop(index).result()
+                if painter != None:
+                    row, column, rect, size, offset = self.tiles[index]
+                    tile = QImage(result, size[0], size[1], QImage.Format_ARGB32_Premultiplied)
+                    painter.drawImage(offset[0], offset[1], tile)
+                self.rendered += 1
+        finally:
+            if painter != None:
+                painter.end()
+
+    #stops workers, export can't be continued after it
+    def Close(self):
+        self.finished = True
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+        self.executor.shutdown()
+
+#exports whole graph, waits for workers, returns written files
+def Export(graph:Graph, path:str, scale:float = 1, tileSize:int = 2048, workers:int = None, background:str = '#ffffff', stitch:bool = True):
+    export = ImageExport(graph, path, scale, tileSize, workers, background, stitch)
+    while not export.Step():
+        time.sleep(0.01)
+    return export.files
+
+def main():
+    parser = argparse.ArgumentParser(description='Exports graph file to PNG image')
+    parser.add_argument('file', help='binary graph file (see GraphFile), edge list CSV or GraphML (see Importer)')
+    parser.add_argument('image')
+    parser.add_argument('--scale', type=float, default=1, help='image pixels per graph unit')
+    parser.add_argument('--tile', type=int, default=2048, help='side of tile in pixels')
+    parser.add_argument('--workers', type=int, help='worker processes (all cores by default)')
+    parser.add_argument('--tiles', action='store_true', help='write tiles as separate files instead of one image')
+    args = parser.parse_args()
+
+    if os.path.splitext(args.file)[1].lower() == '.bin':
+        import GraphFile
+        graph = GraphFile.Load(args.file)
+    else:
+        import Importer
+        graph = Importer.Import(args.file, 8000, 8000).graph
+    start = time.perf_counter()
+    files = Export(graph, args.image, args.scale, args.tile, args.workers, stitch=not args.tiles)
+    print(f'{len(files)} file(s) written in {time.perf_counter() - start:.2f} s: {files[0]}' + (' ...' if len(files) > 1 else ''), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#compact binary graph file - header followed by columns of node and link arrays
+#  header: magic, version, area width and height, number of nodes and links
+#  nodes: x, y, width, height (int32) and color index (uint8) columns
+#  links: first and second node index (int32) columns
+#every column starts at multiple of 8 bytes, so it is memory-mapped as is and read by slices without parsing
+#numpy is optional - without it files can't be saved or loaded
+import gc
+import struct
+from GraphObjects import *
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+available = np is not None
+
+magic = b'GRPH'
+version = 1
+header = struct.Struct('<4sIqqqq')
+
+nodeColumns = (('x', 'int32'), ('y', 'int32'), ('width', 'int32'), ('height', 'int32'), ('color', 'uint8'))
+linkColumns = (('first', 'int32'), ('second', 'int32'))
+
+#offset of every column in file with given number of nodes and links
+def GetColumnOffsets(nodeCount:int, linkCount:int):
+    offsets = {}
+    offset = header.size + (-header.size) % 8
+    for columns, count in ((nodeColumns, nodeCount), (linkColumns, linkCount)):
+        for name, dtype in columns:
+            offsets[name] = offset
+            offset += count * np.dtype(dtype).itemsize
+            offset += (-offset) % 8
+    return offsets
+
+#writes graph given by columns, used by Save and to create files without building graph first (benchmarks)
+#columns - name -> array for every node and link column
+def WriteColumns(path:str, width:int, height:int, columns:dict):
+    node_count = len(columns['x'])
+    link_count = len(columns['first'])
+    offsets = GetColumnOffsets(node_count, link_count)
+    with open(path, 'wb') as file:
+        file.write(header.pack(magic, version, width, height, node_count, link_count))
+        for name, dtype in nodeColumns + linkColumns:
+            file.write(b'\0' * (offsets[name] - file.tell()))
+            file.write(np.ascontiguousarray(columns[name], dtype).tobytes())
+
+#columns of file for graph and nodes in order of their indices in file
+def GetColumns(graph:Graph):
+    nodes = list(graph.nodes)
+    count = len(nodes)
+    indices = {node : index for index, node in enumerate(nodes)}
+    links = list(graph.links)
+    columns = {
+        'x' : np.fromiter((node.pos.x for node in nodes), np.int32, count),
+        'y' : np.fromiter((node.pos.y for node in nodes), np.int32, count),
+        'width' : np.fromiter((node.width for node in nodes), np.int32, count),
+        'height' : np.fromiter((node.height for node in nodes), np.int32, count),
+        'color' : np.fromiter((node.colorIndex for node in nodes), np.uint8, count),
+        'first' : np.fromiter((indices[link.firstNode] for link in links), np.int32, len(links)),
+        'second' : np.fromiter((indices[link.secondNode] for link in links), np.int32, len(links)),
+    }
+    return nodes, columns
+
+def Save(graph:Graph, path:str):
+    nodes, columns = GetColumns(graph)
+    WriteColumns(path, graph.width, graph.height, columns)
+
+#reads file into new graph chunk by chunk - all nodes first, then links
+#graph is usable between chunks, so ui can show and edit it while the rest is still loading
+class GraphReader:
+    def __init__(self, path:str):
+        with open(path, 'rb') as file:
+            data = file.read(header.size)
+        if len(data) < header.size:
+            raise ValueError('Not a graph file: ' + path)
+        file_magic, file_version, width, height, self.nodeCount, self.linkCount = header.unpack(data)
+        if file_magic != magic:
+            raise ValueError('Not a graph file: ' + path)
+        if file_version != version:
+            raise ValueError(f'Unsupported graph file version {file_version}: ' + path)
+
+        #columns are mapped, not read - pages are loaded by system when chunk touches them
+        offsets = GetColumnOffsets(self.nodeCount, self.linkCount)
+        self.columns = {}
+        for columns, count in ((nodeColumns, self.nodeCount), (linkColumns, self.linkCount)):
+            for name, dtype in columns:
+                self.columns[name] = np.memmap(path, dtype, 'r', offsets[name], (count,)) if count else np.zeros(0, dtype)
+
+        self.graph = Graph(width, height)
+        #node of every index read so far, links refer to them
+        self.nodes : list[Node] = []
+        self.linksRead = 0
+
+    def IsFinished(self):
+        return len(self.nodes) == self.nodeCount and self.linksRead == self.linkCount
+
+    #part of file read (0..1), nodes and links are counted the same
+    def GetProgress(self):
+        total = self.nodeCount + self.linkCount
+        return 1 if total == 0 else (len(self.nodes) + self.linksRead) / total
+
+    #reads up to count nodes or links into graph (bulk insertion, no validation), returns True when everything is read
+    def ReadChunk(self, count:int):
+        #chunk creates lots of objects and no garbage - collector would scan all of them again and again
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            if len(self.nodes) < self.nodeCount:
+                self.ReadNodes(count)
+            elif self.linksRead < self.linkCount:
+                self.ReadLinks(count)
+        finally:
+            if collecting:
+                gc.enable()
+        return self.IsFinished()
+
+    def ReadNodes(self, count:int):
+        first = len(self.nodes)
+        last = min(first + count, self.nodeCount)
+        #tolist converts whole slice at once - much faster than reading items one by one
+        xs, ys, widths, heights, color_indices = (self.columns[name][first:last].tolist() for name, dtype in nodeColumns)
+        nodes = []
+        for x, y, width, height, color in zip(xs, ys, widths, heights, color_indices):
+            node = Node(self.graph, width, height, color)
+            node.pos = Vector2d(x, y)
+            nodes.append(node)
+        self.graph.AddNodes(nodes)
+        self.nodes.extend(nodes)
+
+    def ReadLinks(self, count:int):
+        first = self.linksRead
+        last = min(first + count, self.linkCount)
+        nodes = self.nodes
+        firsts = self.columns['first'][first:last]
+        seconds = self.columns['second'][first:last]
+        #broken file must not refer to nodes it doesn't have - links of chunk are checked before any is added
+        for indices in (firsts, seconds):
+            if len(indices) and (indices.min() < 0 or indices.max() >= self.nodeCount):
+                raise ValueError(f'Link refers to missing node (file has {self.nodeCount} nodes)')
+        links = []
+        for first_index, second_index in zip(firsts.tolist(), seconds.tolist()):
+            links.append(Link(nodes[first_index], nodes[second_index]))
+        self.graph.AddLinks(links)
+        self.linksRead = last
+
+def Load(path:str, chunkSize:int = 65536):
+    reader = GraphReader(path)
+    while not reader.ReadChunk(chunkSize):
+        pass
+    return reader.graph
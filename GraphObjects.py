@@ -1,11 +1,8 @@
-from types import NoneType
-from typing import Any
-from pygame import Vector2
+#graph model - doesn't depend on any ui toolkit, so it can be used without Qt (benchmarks, batch processing)
+#rendering is done by Qt layer (GraphQt) which is imported only when something is rendered
 from Utils import *
-from PyQt5.QtWidgets import QWidget
-from PyQt5.QtGui import QPainter, QColor, QColorConstants, QInputEvent
-from PyQt5.QtCore import Qt, QEvent
-from random import choice as get_random
+from SpatialHash import SpatialHash
+from random import Random
 from math import ceil, floor, sqrt
 
 colors = (
@@ -26,115 +23,96 @@ colors = (
     '#ff9999',
 )
 
+#Qt layer is imported on first render, not on import of the model
+def GetRenderer():
+    import GraphQt
+    return GraphQt
+
+#mouse event independent from ui toolkit - ui layer converts its events to these (see GraphQt.ConvertMouseEvent)
+class MouseEvent:
+    #event types
+    Press = 0
+    Release = 1
+    Move = 2
+    DoubleClick = 3
+
+    #buttons
+    NoButton = 0
+    LeftButton = 1
+    RightButton = 2
+    MiddleButton = 4
+
+    def __init__(self, type:int, button:int, x:float, y:float):
+        self.type = type
+        self.button = button
+        self.x = x
+        self.y = y
+
 class GraphicsFigure:
+    __slots__ = ()
+
     #renders figure on screen
-    def Render(self, painter: QPainter): ...
+    def Render(self, painter): ...
 
     #offset is used to create "safe" area to allow clicking near figure
     #mainly used by link - clicking exactly on line is a pain
     def IsIntersectingPoint(self, point: Vector2d, offset = 0): ...
 
     #processes input (only mouse events for now)
-    def ProcessInput(self, event:QInputEvent): ...
+    def ProcessInput(self, event:MouseEvent): ...
 
     #Geets hint text that will be displayed on hover
     def GetHint(self): ...
+
+    #area (x, y, width, height) covered by figure on screen
+    def GetBounds(self): ...
     
 class Node(GraphicsFigure):
-    height : int = 10
-    width : int = height * 2
-    def __init__(self, parent):
+    #default size, every node can have its own
+    defaultHeight : int = 10
+    defaultWidth : int = defaultHeight * 2
+    #slots instead of per-instance dict - graphs have millions of nodes
+    #drag state is not here, it belongs to graph's NodeDrag - only one node is dragged at a time
+    __slots__ = ('pos', 'center', 'parent', 'width', 'height', 'colorIndex')
+
+    #color - index in colors, random by default (drawn from random generator of parent graph)
+    def __init__(self, parent, width:int = None, height:int = None, color:int = None):
         #top-left corner coordinates
         self.pos:Vector2d = Vector2d(0, 0)
+        #filled by GetCenter - reused, so asking for center doesn't create objects
+        self.center:Vector2d = Vector2d(0, 0)
         self.parent = parent #parent graph
-
-        self.color = get_random(colors)
-
-        #movement variables
-        self.moving = False
-        self.offset :Vector2d = None
+        self.width = self.defaultWidth if width == None else width
+        self.height = self.defaultHeight if height == None else height
+        self.colorIndex = parent.random.randrange(len(colors)) if color == None else color
 
     def GetHint(self):
         return 'Drag LMB to drag node\nDrag RMB to create link\nPress middle mouse button to Remove'    
 
-    def Render(self, painter: QPainter):
-        painter.save()
-        col = QColor(0, 0, 0)
-        col.setNamedColor(self.color)
-        painter.setPen(col)
+    def Render(self, painter):
+        GetRenderer().RenderNode(painter, self)
 
-        painter.setBrush(col)
-        painter.drawRect(self.pos.x, self.pos.y, self.width, self.height)
-        painter.restore()
+    def GetBounds(self):
+        #pen adds one pixel to the right and bottom
+        return (self.pos.x, self.pos.y, self.width + 1, self.height + 1)
     
-    def ProcessInput(self, event : QInputEvent):
-        result = False
-        type = event.type()
-        mousePos = Vector2d(event.localPos().x(), event.localPos().y())
-        max_x = self.parent.parent.width()
-        max_y = self.parent.parent.height()
-        mousePos.x = ClampInt(mousePos.x, 0, max_x)
-        mousePos.y = ClampInt(mousePos.y, 0, max_y)
-        if type == QEvent.MouseButtonPress:
-            if event.button() == Qt.MouseButton.LeftButton:
-                #start moving
-                if self.IsIntersectingPoint(mousePos):
-                    self.moving = True
-                    self.original_pos = self.pos.Clone()
-                    center = self.GetCenter()
-                    self.offset = center - mousePos
-                    self.prev_mouse_pos = mousePos
-                    result = True
-        elif type == QEvent.MouseMove:
-            if event.button() == Qt.MouseButton.NoButton:
-                #update position
-                if self.moving:
-                    prev_valid_pos = self.pos.Clone()
-                    old_center = self.GetCenter()
-
-                    #trying to place where mouse is
-                    new_position = mousePos + self.offset
-                    self.MoveCenterTo(new_position.x, new_position.y)
-                    
-                    if not self.parent.IsValidNodePosition(self):
-                        #intersection happened, trying to move towards mouse
-                        diff = mousePos - self.prev_mouse_pos
-                        new_center = old_center + diff
-                        self.MoveCenterTo(new_center.x, new_center.y)
-                        if not self.parent.IsValidNodePosition(self):
-                            #still intersection, not moving
-                            self.pos = prev_valid_pos
-                    self.prev_mouse_pos = mousePos
-                    result = True
-        elif type == QEvent.MouseButtonRelease:
-            if event.button() == Qt.MouseButton.LeftButton:
-                #end moving
-                if self.moving:
-                    self.parent.UpdateNodeGrid(self, self.original_pos)
-                    self.moving = False
-                    self.offset = None
-                    self.original_pos = None
-                    result = True
-        return result
+    def ProcessInput(self, event : MouseEvent):
+        return self.parent.drag.ProcessInput(self, event)
 
     #offset is used to create "safe" area to allow clicking near figure
     #mainly used by link - clicking exactly on line is a pain
     def IsIntersectingPoint(self, point: Vector2d, offset = 0):
-        isXInside = point.x > self.pos.x and point.x < self.pos.x + self.width
-        isYInside = point.y > self.pos.y and point.y < self.pos.y + self.height
-        return (isXInside and isYInside)
+        return self.IsContaining(point.x, point.y)
+
+    def IsContaining(self, x, y):
+        pos = self.pos
+        return pos.x < x < pos.x + self.width and pos.y < y < pos.y + self.height
 
     #intersecting with another node
     def IsIntersectingOther(self, other):
-        self_left = self.pos.x
-        self_right = self.pos.x + self.width
-        self_top = self.pos.y
-        self_bottom = self.pos.y + self.height
-        other_left = other.pos.x
-        other_right = other.pos.x + other.width
-        other_top = other.pos.y
-        other_bottom = other.pos.y + other.height
-        if self_left > other_right or self_right < other_left or self_top > other_bottom or self_bottom < other_top:
+        pos = self.pos
+        other_pos = other.pos
+        if pos.x > other_pos.x + other.width or pos.x + self.width < other_pos.x or pos.y > other_pos.y + other.height or pos.y + self.height < other_pos.y:
             return False
         return True
 
@@ -142,36 +120,112 @@ class Node(GraphicsFigure):
         self.pos.x = int(newX - self.width / 2)
         self.pos.y = int(newY - self.height / 2)
     
+    #returned point is owned by node and follows it - Clone it to keep current value
     def GetCenter(self):
-        return Vector2d(self.pos.x + int(Node.width /2), self.pos.y + int(Node.height / 2))
+        center = self.center
+        center.x = self.pos.x + self.width // 2
+        center.y = self.pos.y + self.height // 2
+        return center
+
+
+#dragging of node with LMB - state of the only dragged node lives here instead of every node
+#graph knows which node is dragged (Graph.movingNode), this keeps where it was grabbed
+#input is processed without creating objects, positions are plain ints
+class NodeDrag:
+    def __init__(self, graph):
+        self.graph = graph
+        #mouse position relative to node center
+        self.offsetX = 0
+        self.offsetY = 0
+        #mouse position of previous move
+        self.prevMouseX = 0
+        self.prevMouseY = 0
+        #node position before last move, passed to graph when node moved
+        self.prevPos = Vector2d(0, 0)
+
+    def ProcessInput(self, node:Node, event:MouseEvent):
+        graph = self.graph
+        type = event.type
+        #picking uses exact world point, node positions and drag anchor are whole pixels
+        x = ClampInt(event.x, 0, graph.width)
+        y = ClampInt(event.y, 0, graph.height)
+        mouse_x = round(x)
+        mouse_y = round(y)
+        if type == MouseEvent.Press:
+            if event.button == MouseEvent.LeftButton:
+                #start moving
+                if node.IsContaining(x, y):
+                    graph.StartMovingNode(node)
+                    center = node.GetCenter()
+                    self.offsetX = center.x - mouse_x
+                    self.offsetY = center.y - mouse_y
+                    self.prevMouseX = mouse_x
+                    self.prevMouseY = mouse_y
+                    return True
+        elif type == MouseEvent.Move:
+            if event.button == MouseEvent.NoButton:
+                #update position
+                if node == graph.movingNode:
+                    pos = node.pos
+                    prev_x = pos.x
+                    prev_y = pos.y
+                    old_center_x = prev_x + node.width // 2
+                    old_center_y = prev_y + node.height // 2
+
+                    #trying to place where mouse is
+                    node.MoveCenterTo(mouse_x + self.offsetX, mouse_y + self.offsetY)
+
+                    if not graph.IsValidNodePosition(node):
+                        #intersection happened, trying to move towards mouse
+                        node.MoveCenterTo(old_center_x + mouse_x - self.prevMouseX, old_center_y + mouse_y - self.prevMouseY)
+                        if not graph.IsValidNodePosition(node):
+                            #still intersection, not moving
+                            pos.x = prev_x
+                            pos.y = prev_y
+                    if pos.x != prev_x or pos.y != prev_y:
+                        #keeping spatial index up to date so hover works during drag
+                        self.prevPos.x = prev_x
+                        self.prevPos.y = prev_y
+                        graph.OnNodeMoved(node, self.prevPos)
+                    self.prevMouseX = mouse_x
+                    self.prevMouseY = mouse_y
+                    return True
+        elif type == MouseEvent.Release:
+            if event.button == MouseEvent.LeftButton:
+                #end moving
+                if node == graph.movingNode:
+                    #grid is already updated on every move step
+                    graph.EndMovingNode(node)
+                    return True
+        return False
 
     
 class Link(GraphicsFigure):
-    color = QColorConstants.Black
+    color = '#000000'
+    __slots__ = ('firstNode', 'secondNode', 'unfinished', 'tempPoint')
+
     def __init__(self, node1: Node, node2: Node = None):
         self.firstNode = node1
         self.secondNode = node2
         self.unfinished = node2 == None
-        self.tempPoint = node1.GetCenter()
+        #end of link which is being created, follows mouse
+        self.tempPoint = node1.GetCenter().Clone() if self.unfinished else None
 
     def GetHint(self):
         return 'Press middle mouse button to Remove'
     
-    def Render(self, painter: QPainter):
-        painter.save()
-        painter.setPen(self.color)
-        start = self.GetStartPoint()         
-        end = self.GetEndPoint()
-        painter.drawLine(start.x, start.y, end.x, end.y)
-        painter.restore()
+    def Render(self, painter):
+        GetRenderer().RenderLink(painter, self)
+
+    def GetBounds(self):
+        return GetPointsBounds((self.GetStartPoint(), self.GetEndPoint()), 1)
 
-    def ProcessInput(self, event : QInputEvent):
+    def ProcessInput(self, event : MouseEvent):
         result = False
-        type = event.type()
-        if type == QEvent.MouseMove:
+        type = event.type
+        if type == MouseEvent.Move:
             if self.unfinished:
-                mousePos = event.localPos()
-                self.UpdateTempPoint(mousePos.x(), mousePos.y())
+                self.UpdateTempPoint(event.x, event.y)
                 result = True
         return result
 
@@ -180,20 +234,19 @@ class Link(GraphicsFigure):
         end = self.GetEndPoint()
         x0, y0 = point.x, point.y
     
-        AB = Vector2d(end.x - start.x, end.y - start.y)
-        BA = Vector2d(start.x - end.x, start.y - end.y)
-        AT = Vector2d(x0 - start.x, y0 - start.y)
-        BT = Vector2d(x0 - end.x, y0 - end.y)
+        AB_x, AB_y = end.x - start.x, end.y - start.y
+        AT_x, AT_y = x0 - start.x, y0 - start.y
+        BT_x, BT_y = x0 - end.x, y0 - end.y
 
         #using scalar product to determing whether point normal to line exists
-        if (AB.x * AT.x + AB.y *AT.y) < 0 or (BA.x * BT.x + BA.y * BT.y) < 0:
+        if (AB_x * AT_x + AB_y * AT_y) < 0 or (AB_x * BT_x + AB_y * BT_y) > 0:
             #there is no normal to line, distance to closest end point
-            distance_to_start = abs(sqrt((x0 - start.x) ** 2 + (y0 - start.y) ** 2)); 
-            distance_to_end = abs(sqrt((x0 - end.x) ** 2 + (y0 - end.y) ** 2)); 
+            distance_to_start = sqrt(AT_x ** 2 + AT_y ** 2)
+            distance_to_end = sqrt(BT_x ** 2 + BT_y ** 2)
             distance = min(distance_to_start, distance_to_end)
         else:
             #distance to closest point on line
-            length = sqrt((start.y - end.y) ** 2 + (end.x - start.x) ** 2)
+            length = sqrt(AB_x ** 2 + AB_y ** 2)
             distance = abs(((start.y - end.y) * x0 + (end.x - start.x) * y0 + start.x * end.y - end.x * start.y) / length) 
 
         #takes "safe" area - offset - into account
@@ -204,6 +257,7 @@ class Link(GraphicsFigure):
         self.secondNode = node
         self.unfinished = False
 
+    #returned points are owned by nodes (see Node.GetCenter) - nothing is created per call
     def GetStartPoint(self):
         return self.firstNode.GetCenter()
 
@@ -213,59 +267,270 @@ class Link(GraphicsFigure):
         return self.secondNode.GetCenter()
 
     def UpdateTempPoint(self, x, y):
-        self.tempPoint = Vector2d(x, y)
+        self.tempPoint.Set(x, y)
 
 
 #holds all objects and processes relative actions
 class Graph:
-    gridSize = Node.width * 2
-    def __init__(self, parentWidget : QWidget):
-        self.parent = parentWidget
-
-        #order in this list influences render order
-        self.objects: list[GraphicsFigure] = []
-
-        #grid is used to optimize object intersection - only nearby nodes are checked
-        #i didn't refactor self.objects - grid can in fact be used to store nodes, but it's used only for intersection
-        #render and input processing still use self.objects
-        #yeah, it influences app memory, but it doesn't influence performance and I didn't have time to refactor =)
-        self.grid : dict[tuple[int, int], list[GraphicsFigure]] = {}
+    gridSize = Node.defaultWidth * 2
+    #"safe" area around figures used for picking with mouse
+    pickOffset = 5
+    #more dirty rects than this are merged into one to keep repaint region simple
+    maxDirtyRects = 64
+    #picked objects remembered for different positions until graph changes
+    maxPickCache = 64
+    #level of detail - below these zoom levels nodes are rendered as points and then as density of grid cells
+    pointZoom = 0.5
+    densityZoom = 0.15
+    #width, height - size of area where nodes can be placed
+    #useNodeStore - mirror nodes into array store for vectorized bulk queries (only if numpy is installed and only after first such query)
+    #useLinkStore - mirror link segments into array store for vectorized hit-testing (only if numpy is installed)
+    def __init__(self, width:int, height:int, useNodeStore = True, useLinkStore = True):
+        self.width = width
+        self.height = height
+        #random choices of graph (colors of new nodes) - own generator, so replay can seed it without touching others
+        self.random = Random()
+
+        #render layers - links are always rendered below nodes
+        #dicts keep insertion order and give O(1) add and remove
+        #links are rendered from newest to oldest, nodes from oldest to newest
+        #values are insertion sequence numbers - used to keep top-most-first order for grid queries
+        self.links: dict[Link, int] = {}
+        self.nodes: dict[Node, int] = {}
+        self.sequence = 0
+
+        #grid is used to optimize object intersection and picking - only nearby objects are checked
+        #nodes of any size are stored at level where they fit one cell, crowded cells are split (see SpatialHash)
+        self.grid = SpatialHash(self.gridSize)
+        #link is stored in every cell its segment (expanded by pick offset) crosses
+        self.linkGrid : dict[tuple[int, int], set[Link]] = {}
+        self.linkCells : dict[Link, list[tuple[int, int]]] = {}
+
+        #node geometry in contiguous arrays, used for bulk collision queries (see GetNodeStore)
+        self.useNodeStore = useNodeStore
+        self.nodeStore = None
+        self.linkStore = None
+        if useLinkStore:
+            from LinkStore import LinkStore
+            if LinkStore.available:
+                self.linkStore = LinkStore()
+
+        #scene-based rendering backend mirroring all figures (see GraphScene), None - figures are painted directly
+        #set by SetScene, every change of figures is forwarded to it
+        self.scene = None
+        #autosave journal (see Journal), None - changes are not journaled
+        #set by Journal.Start, every change of figures is forwarded to it
+        self.journal = None
+
+        #links incident to each node - cascade removal only touches node's own links
+        self.adjacency : dict[Node, set[Link]] = {}
+        #unordered node pair -> link, used for duplicate check instead of scanning all objects
+        self.edges : dict[frozenset[Node], Link] = {}
 
         #link which is in progress of creation
         #added to container after successfull creation
         self.currentLink:Link = None
 
-    def GetNodeGrid(self, node:Node):
-        x = node.pos.x // self.gridSize
-        y = node.pos.y // self.gridSize
-        return (x,y)
+        #node which is dragged now - it and its links are rendered separately from static figures
+        self.movingNode:Node = None
+        #state of dragging, shared by all nodes
+        self.drag = NodeDrag(self)
+        #changed whenever static figures (all except moving node, its links and current link) change
+        #used to know when cached render of static figures is outdated
+        self.staticVersion = 0
+        #changed whenever nodes or links are added or removed - used to know when topology snapshot is outdated
+        self.topologyVersion = 0
+        #changed whenever any figure is added, removed or moved - used to memoize picking
+        self.version = 0
+        #(x, y, filter type) -> picked object, valid while version is pickCacheVersion
+        self.pickCache = {}
+        self.pickCacheVersion = 0
+        self.topology = None
+        self.topologyBuiltVersion = -1
+
+        #result of last topology query (see SetHighlight), rendered on top of static figures
+        self.highlightedNodes : set[Node] = set()
+        self.highlightedLinks : set[Link] = set()
+
+        #screen areas changed since last refresh - only they are repainted
+        self.dirtyRects : list[tuple[int, int, int, int]] = []
+        self.fullRedraw = False
+
+    def SetBounds(self, width:int, height:int):
+        self.width = width
+        self.height = height
+        if self.scene != None:
+            self.scene.SetBounds(width, height)
+
+    #switches rendering and picking to scene backend (None - back to painting figures directly)
+    #scene is filled with current figures once, then kept in sync incrementally
+    def SetScene(self, scene):
+        if self.scene != None:
+            self.scene.Clear()
+        self.scene = scene
+        if scene != None:
+            scene.Build(self)
+        self.staticVersion += 1
+        self.MarkAllDirty()
+
+    def GetCell(self, x, y):
+        return (int(x // self.gridSize), int(y // self.gridSize))
+
+    #all cells which have points closer than offset to segment
+    def GetSegmentCells(self, start:Vector2d, end:Vector2d, offset = 0):
+        size = self.gridSize
+        x0, y0, x1, y1 = start.x, start.y, end.x, end.y
+        if y0 > y1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        for row in range(int((y0 - offset) // size), int((y1 + offset) // size) + 1):
+            #part of segment inside the row (row is expanded by offset too)
+            band_top = max(row * size - offset, y0)
+            band_bottom = min((row + 1) * size + offset, y1)
+            if y0 == y1:
+                xa, xb = x0, x1
+            else:
+                xa = x0 + (x1 - x0) * (band_top - y0) / (y1 - y0)
+                xb = x0 + (x1 - x0) * (band_bottom - y0) / (y1 - y0)
+            left = int((min(xa, xb) - offset) // size)
+            right = int((max(xa, xb) + offset) // size)
+            for column in range(left, right + 1):
+                yield (column, row)
+
+    def AddLinkToGrid(self, link:Link):
+        cells = list(self.GetSegmentCells(link.GetStartPoint(), link.GetEndPoint(), self.pickOffset))
+        self.linkCells[link] = cells
+        for cell in cells:
+            if not cell in self.linkGrid:
+                self.linkGrid[cell] = set()
+            self.linkGrid[cell].add(link)
+
+    def RemoveLinkFromGrid(self, link:Link):
+        for cell in self.linkCells.pop(link, ()):
+            self.linkGrid[cell].discard(link)
+            if len(self.linkGrid[cell]) == 0:
+                self.linkGrid.pop(cell)
+
+    def MarkDirty(self, rect:tuple[int, int, int, int]):
+        self.dirtyRects.append(rect)
+
+    def MarkAllDirty(self):
+        self.fullRedraw = True
+
+    #returns areas to repaint and forgets them, None means whole screen
+    def TakeDirtyRects(self):
+        rects = self.dirtyRects
+        if self.fullRedraw:
+            rects = None
+        elif len(rects) > self.maxDirtyRects:
+            united = rects[0]
+            for rect in rects:
+                united = UniteRects(united, rect)
+            rects = [united]
+        self.dirtyRects = []
+        self.fullRedraw = False
+        return rects
+
+    #all objects in render order (bottom to top)
+    @property
+    def objects(self):
+        yield from reversed(self.links)
+        yield from self.nodes
+
+    #key of link between two nodes (any order)
+    @staticmethod
+    def GetEdgeKey(node1 : Node, node2 : Node):
+        return frozenset((node1, node2))
 
     def AddNode(self, node:Node):   
-        #appending nodes to back so that links are always rendered first
-        self.objects.append(node)
-        cell = self.GetNodeGrid(node)
-        if not cell in self.grid:
-            self.grid[cell] = []
-        self.grid[cell].append(node)
+        self.AddNodes([node])
+
+    #adds many nodes at once without position validation
+    def AddNodes(self, nodes:list[Node]):
+        for node in nodes:
+            self.sequence += 1
+            self.nodes[node] = self.sequence
+            self.adjacency[node] = set()
+            self.grid.Insert(node)
+        if self.nodeStore != None:
+            self.AddToNodeStore(nodes)
+        if self.scene != None:
+            self.scene.AddNodes(nodes)
+        if self.journal != None:
+            self.journal.AddNodes(nodes)
+        self.version += 1
+        self.staticVersion += 1
+        self.topologyVersion += 1
+        if len(nodes) > self.maxDirtyRects:
+            self.MarkAllDirty()
+        else:
+            for node in nodes:
+                self.MarkDirty(node.GetBounds())
 
     def AddLink(self, link : Link):
-        #appending links to front so that links are always rendered first
-        self.objects.insert(0, link)
+        self.AddLinks([link])
+
+    #adds many links at once without duplicate check - caller makes sure they are unique
+    def AddLinks(self, links:list[Link]):
+        for link in links:
+            self.sequence += 1
+            self.links[link] = self.sequence
+            self.AddLinkToGrid(link)
+            self.adjacency[link.firstNode].add(link)
+            self.adjacency[link.secondNode].add(link)
+            self.edges[self.GetEdgeKey(link.firstNode, link.secondNode)] = link
+        if self.linkStore != None:
+            self.linkStore.AddMany(links, [self.links[link] for link in links])
+        if self.scene != None:
+            self.scene.AddLinks(links)
+        if self.journal != None:
+            self.journal.AddLinks(links)
+        self.version += 1
+        self.staticVersion += 1
+        self.topologyVersion += 1
+        if len(links) > self.maxDirtyRects:
+            self.MarkAllDirty()
+        else:
+            for link in links:
+                self.MarkDirty(link.GetBounds())
 
     def RemoveNode(self, node : Node):
-        self.objects.remove(node)
-        for object in self.objects[:]:
-            if type(object) == Link:
-                if object.firstNode == node or object.secondNode == node:
-                    self.objects.remove(object)
-        prev_cell = (node.pos.x // self.gridSize, node.pos.y // self.gridSize)
-        if prev_cell in self.grid:
-                self.grid[prev_cell].remove(node)
-                if len(self.grid[prev_cell]) == 0:
-                    self.grid.pop(prev_cell)
+        self.nodes.pop(node)
+        if self.nodeStore != None:
+            self.nodeStore.Remove(node)
+        if node == self.movingNode:
+            self.movingNode = None
+        self.highlightedNodes.discard(node)
+        self.version += 1
+        self.staticVersion += 1
+        self.topologyVersion += 1
+        self.MarkDirty(node.GetBounds())
+        #copy - RemoveLink changes adjacency of this node
+        for link in list(self.adjacency[node]):
+            self.RemoveLink(link)
+        self.adjacency.pop(node)
+        self.grid.Remove(node)
+        if self.scene != None:
+            self.scene.Remove(node)
+        if self.journal != None:
+            self.journal.RemoveNode(node)
 
     def RemoveLink(self, link : Link):
-        self.objects.remove(link)
+        self.links.pop(link)
+        self.RemoveLinkFromGrid(link)
+        if self.linkStore != None:
+            self.linkStore.Remove(link)
+        self.highlightedLinks.discard(link)
+        self.version += 1
+        self.staticVersion += 1
+        self.topologyVersion += 1
+        self.MarkDirty(link.GetBounds())
+        self.adjacency[link.firstNode].discard(link)
+        self.adjacency[link.secondNode].discard(link)
+        self.edges.pop(self.GetEdgeKey(link.firstNode, link.secondNode), None)
+        if self.scene != None:
+            self.scene.Remove(link)
+        if self.journal != None:
+            self.journal.RemoveLink(link)
 
     def RemoveObject(self, object:GraphicsFigure):
         if type(object) == Node:
@@ -273,101 +538,256 @@ class Graph:
         elif type(object) == Link:
             self.RemoveLink(object)
 
-    def UpdateNodeGrid(self, node:Node, original_pos:Vector2d = Vector2d(-1, -1)):
-        prev_cell = (original_pos.x // self.gridSize, original_pos.y // self.gridSize)
-        new_cell = self.GetNodeGrid(node)
-        if not new_cell in self.grid:
-            self.grid[new_cell] = []
-        if new_cell != prev_cell:
-            #removing node from previous cell if it is valid (will be invalid for new nodes)
-            #i remove empty cells to avoid checking them for intersection
-            if prev_cell in self.grid:
-                self.grid[prev_cell].remove(node)
-                if len(self.grid[prev_cell]) == 0:
-                    self.grid.pop(prev_cell)
-            
-            #moving node to new grid
-            self.grid[new_cell].append(node)
-
-
+    #compressed sparse row snapshot of nodes and links for traversal queries (see Topology)
+    #built on first request after any node or link was added or removed, None without numpy
+    def GetTopology(self):
+        from Topology import Topology
+        if not Topology.available:
+            return None
+        if self.topologyBuiltVersion != self.topologyVersion:
+            self.topology = Topology(self.nodes, self.links)
+            self.topologyBuiltVersion = self.topologyVersion
+        return self.topology
+
+    #marks nodes and links found by query, empty lists clear highlight
+    def SetHighlight(self, nodes:list[Node], links:list[Link]):
+        self.highlightedNodes = set(nodes)
+        self.highlightedLinks = set(links)
+        if self.scene != None:
+            self.scene.SetHighlight(self.highlightedNodes, self.highlightedLinks)
+        self.staticVersion += 1
+        self.MarkAllDirty()
+
+    #moves node to cell of its current position - O(1), nothing happens while it stays in the same cell
+    def UpdateNodeGrid(self, node:Node):
+        self.grid.Move(node)
+
+
+    #moving node is taken out of static figures until EndMovingNode
+    def StartMovingNode(self, node:Node):
+        self.movingNode = node
+        self.OnActiveSetChanged(node)
+
+    #dragged node is journaled once, at the place where it is dropped
+    def EndMovingNode(self, node:Node):
+        if self.movingNode == node:
+            self.movingNode = None
+            self.OnActiveSetChanged(node)
+            if self.journal != None:
+                self.journal.MoveNode(node)
+
+    def OnActiveSetChanged(self, node:Node):
+        if self.scene != None:
+            self.scene.SetActive(node, node == self.movingNode)
+        #active figures are rendered on top, so their areas change a bit as well
+        self.staticVersion += 1
+        self.MarkDirty(node.GetBounds())
+        for link in self.adjacency[node]:
+            self.MarkDirty(link.GetBounds())
+
+    #node position changed - moving it in grid together with its links
+    def OnNodeMoved(self, node:Node, prev_pos:Vector2d):
+        self.UpdateNodeGrid(node)
+        if self.nodeStore != None:
+            self.nodeStore.Move(node, node.pos.x, node.pos.y)
+        if self.scene != None:
+            self.scene.MoveNode(node)
+        self.version += 1
+        if node != self.movingNode:
+            self.staticVersion += 1
+            if self.journal != None:
+                self.journal.MoveNode(node)
+        #repainting both old and new place of node and its links
+        prev_bounds = (prev_pos.x, prev_pos.y, node.width + 1, node.height + 1)
+        self.MarkDirty(UniteRects(prev_bounds, node.GetBounds()))
+        prev_center = Vector2d(prev_pos.x + int(node.width / 2), prev_pos.y + int(node.height / 2))
+        for link in self.adjacency[node]:
+            self.MarkDirty(GetPointsBounds((prev_center, link.GetStartPoint(), link.GetEndPoint()), 1))
+            self.RemoveLinkFromGrid(link)
+            self.AddLinkToGrid(link)
+            if self.linkStore != None:
+                self.linkStore.Update(link)
+
+    #memoized - hover, panning and hint ask for the same position several times per frame
+    #cached results are dropped as soon as any figure is added, removed or moved
     def GetObjectUnderMouse(self, mouse_pos:Vector2d, filter_type = None):
-        #order is reversed in self.objects (for rendering)
-        #so the items on top will be at the back!
-        #reversed function is simply perfect - it doesn't create a copy, only reverses iterators. 
-        # Love it.
-        for object in reversed(self.objects):
-            if filter_type == None or type(object) == filter_type:
-                if object.IsIntersectingPoint(mouse_pos, 5):
-                    return object
-
-    def ShowHint(self, object: GraphicsFigure, mouse_pos:Vector2d, painter:QPainter):
-        hint_text = object.GetHint()
-        DrawTextFrame(hint_text, mouse_pos, painter)
+        if mouse_pos == None:
+            return None
+        if self.pickCacheVersion != self.version:
+            self.pickCache.clear()
+            self.pickCacheVersion = self.version
+        key = (mouse_pos.x, mouse_pos.y, filter_type)
+        if key in self.pickCache:
+            return self.pickCache[key]
+        result = self.PickObject(mouse_pos, filter_type)
+        #mouse wandering over unchanged graph would fill cache forever
+        if len(self.pickCache) >= self.maxPickCache:
+            self.pickCache.clear()
+        self.pickCache[key] = result
+        return result
+
+    def PickObject(self, mouse_pos:Vector2d, filter_type = None):
+        if self.scene != None:
+            return self.scene.GetObjectAt(mouse_pos, self.pickOffset, filter_type)
+        #only objects from grid cells near mouse are checked
+        #among them the one rendered on top wins: newest node, then oldest link
+        if filter_type == None or filter_type == Node:
+            top_node = None
+            for node in self.grid.GetCandidates((mouse_pos.x, mouse_pos.y, 0, 0)):
+                if node.IsIntersectingPoint(mouse_pos, self.pickOffset):
+                    if top_node == None or self.nodes[node] > self.nodes[top_node]:
+                        top_node = node
+            if top_node:
+                return top_node
+        if filter_type == None or filter_type == Link:
+            links = self.linkGrid.get(self.GetCell(mouse_pos.x, mouse_pos.y), ())
+            #crowded cell - all its links are tested with one vectorized call
+            if self.linkStore != None and len(links) >= self.linkStore.minBatch:
+                return self.linkStore.GetTopLinkAtPoint(links, mouse_pos.x, mouse_pos.y, self.pickOffset)
+            top_link = None
+            for link in links:
+                if link.IsIntersectingPoint(mouse_pos, self.pickOffset):
+                    if top_link == None or self.links[link] < self.links[top_link]:
+                        top_link = link
+            return top_link
+
+    def ShowHint(self, object: GraphicsFigure, mouse_pos:Vector2d, painter):
+        GetRenderer().ShowHint(painter, object.GetHint(), mouse_pos)
 
     # renders visualization of objects grid on screen (just for hint)
-    def RenderGrid(self, painter:QPainter):
-        painter.setPen(QColorConstants.LightGray)
-        x = 0
-        y = 0
-        while y < self.parent.height():
-            painter.drawLine(0, y, self.parent.width(), y)
-            y += Graph.gridSize
-
-        while x < self.parent.width():
-            painter.drawLine(x, 0, x, self.parent.height())
-            x += Graph.gridSize 
-
-    def RenderHint(self, painter:QPainter, mouse_pos:Vector2d):
+    # rect limits rendering to part of the screen
+    def RenderGrid(self, painter, rect:tuple[int, int, int, int] = None):
+        GetRenderer().RenderGrid(painter, self, rect)
+
+    #returns True if hint was shown
+    #hint_pos - where hint is drawn if painter coordinates differ from graph ones (mouse position by default)
+    def RenderHint(self, painter, mouse_pos:Vector2d, hint_pos:Vector2d = None):
         hint_object = self.GetObjectUnderMouse(mouse_pos)
         if hint_object:
-            self.ShowHint(hint_object, mouse_pos, painter)
+            self.ShowHint(hint_object, hint_pos or mouse_pos, painter)
+            return True
+        return False
 
-    def Render(self, painter: QPainter):
-        for object in self.objects:
-            object.Render(painter)
+    #links and nodes intersecting rect in render order, only grid cells covering rect are visited
+    def GetVisibleObjects(self, rect:tuple[int, int, int, int] = None):
+        if rect == None:
+            return list(reversed(self.links)), list(self.nodes)
+        nodes = [node for node in self.grid.GetCandidates(rect) if IsRectsIntersecting(rect, node.GetBounds())]
+        nodes.sort(key=self.nodes.__getitem__)
+        links = set()
+        for cell, cell_links in GetGridCells(self.linkGrid, self.GetCell(rect[0], rect[1]), self.GetCell(rect[0] + rect[2], rect[1] + rect[3])):
+            links.update(cell_links)
+        links = [link for link in links if IsRectsIntersecting(rect, link.GetBounds())]
+        links.sort(key=self.links.__getitem__, reverse=True)
+        return links, nodes
+
+    # rect limits rendering to part of the graph, objects outside it are skipped
+    # zoom is scale of painter - it chooses level of detail
+    def Render(self, painter, rect:tuple[int, int, int, int] = None, zoom:float = 1):
+        self.RenderStatic(painter, rect, zoom)
+        self.RenderActive(painter, rect)
+
+    # figures that are not interacted with - they can be rendered once and cached
+    def RenderStatic(self, painter, rect:tuple[int, int, int, int] = None, zoom:float = 1):
+        if zoom < self.densityZoom:
+            #single figures are too small to see - only number of nodes per cell is shown
+            GetRenderer().RenderDensity(painter, self.grid.GetCellCounts(self.gridSize, rect), self.gridSize)
+            return
+        if self.scene != None:
+            #scene hides dragged node and highlights figures itself
+            self.scene.Render(painter, rect or (0, 0, self.width, self.height))
+            return
+        links, nodes = self.GetVisibleObjects(rect)
+        if self.movingNode:
+            active_links = self.adjacency[self.movingNode]
+            links = [link for link in links if not link in active_links]
+            nodes = [node for node in nodes if node != self.movingNode]
+        GetRenderer().RenderBatch(painter, links, nodes, zoom < self.pointZoom)
+        if self.highlightedNodes or self.highlightedLinks:
+            GetRenderer().RenderHighlight(painter,
+                                          [link for link in links if link in self.highlightedLinks],
+                                          [node for node in nodes if node in self.highlightedNodes], zoom < self.pointZoom)
+
+    # figures that are interacted with (moving node, its links and current link) - rendered on top
+    def RenderActive(self, painter, rect:tuple[int, int, int, int] = None):
+        if self.movingNode:
+            for link in self.adjacency[self.movingNode]:
+                if rect == None or IsRectsIntersecting(rect, link.GetBounds()):
+                    link.Render(painter)
+            self.movingNode.Render(painter)
         if self.currentLink != None:
             self.currentLink.Render(painter)
     
-    def ProcessIntersectionIsCell(self, node:Node, cell:tuple[int, int]):
-        if cell in self.grid:
-            for otherObject in self.grid[cell]:
-                if otherObject != node:
-                    if node.IsIntersectingOther(otherObject):
-                        return True
-            return False
-    
     def IsValidNodePosition(self, node:Node):
         #edges
-        if node.pos.x + node.width > self.parent.size().width() or node.pos.x < 0:
+        if node.pos.x + node.width > self.width or node.pos.x < 0:
             return False
 
-        if node.pos.y + node.height > self.parent.size().height() or node.pos.y < 0:
+        if node.pos.y + node.height > self.height or node.pos.y < 0:
             return False
 
-        #intersection with other nodes
-        current_cell = self.GetNodeGrid(node)
-        #check all 9 cells - the one in which thenode is and all it's neighbors
-        for i in [current_cell[0] - 1, current_cell[0], current_cell[0]+1]:
-            for j in [current_cell[1] - 1, current_cell[1], current_cell[1]+1]:
-                if i>=0 and j>=0:   #valid cell index (left and top)
-                    if i<= (self.parent.width() // Graph.gridSize) and j<= (self.parent.height() // Graph.gridSize):#valid cell index (bottom and right)
-                        if self.ProcessIntersectionIsCell(node, (i, j)):
-                            return False
+        #intersection with other nodes - only nodes from nearby cells of every grid level are checked
+        for other in self.grid.GetCandidates((node.pos.x, node.pos.y, node.width, node.height)):
+            if other != node and node.IsIntersectingOther(other):
+                return False
         return True
         
+    def AddToNodeStore(self, nodes):
+        self.nodeStore.AddMany(nodes,
+                               [node.pos.x for node in nodes],
+                               [node.pos.y for node in nodes],
+                               [node.width for node in nodes],
+                               [node.height for node in nodes])
+
+    #store is created by first bulk query - graphs which never run one don't keep the mirror up to date
+    #returns None if store is not used or numpy is not installed
+    def GetNodeStore(self):
+        if self.nodeStore == None and self.useNodeStore:
+            #imported here - numpy import is slow and not needed without the store
+            from NodeStore import NodeStore
+            if NodeStore.available:
+                self.nodeStore = NodeStore(self.gridSize, max(1024, len(self.nodes)))
+                self.AddToNodeStore(list(self.nodes))
+            else:
+                self.useNodeStore = False
+        return self.nodeStore
+
+    #bulk version of IsValidNodePosition for nodes with given top-left corners
+    #returns list of bools, positions are checked against graph only (not against each other)
+    def AreValidNodePositions(self, xs:list[int], ys:list[int]):
+        max_x = self.width - Node.defaultWidth
+        max_y = self.height - Node.defaultHeight
+        store = self.GetNodeStore()
+        if store != None:
+            free = ~store.GetIntersectingMask(xs, ys, Node.defaultWidth, Node.defaultHeight)
+            inside = [0 <= x <= max_x and 0 <= y <= max_y for x, y in zip(xs, ys)]
+            return [a and b for a, b in zip(inside, free.tolist())]
+        node = Node(self)
+        result = []
+        for x, y in zip(xs, ys):
+            node.pos = Vector2d(x, y)
+            result.append(self.IsValidNodePosition(node))
+        return result
+
+    #bulk link picking - top-most link near every point (or None), all candidates are tested at once
+    def GetLinksUnderPoints(self, points:list[Vector2d]):
+        if self.linkStore != None:
+            candidates = [self.linkGrid.get(self.GetCell(point.x, point.y), ()) for point in points]
+            return self.linkStore.GetTopLinksAtPoints([point.x for point in points], [point.y for point in points], candidates, self.pickOffset)
+        return [self.GetObjectUnderMouse(point, Link) for point in points]
+
+    #nodes intersecting or touching rect (x, y, width, height)
+    def GetNodesInRect(self, rect:tuple[int, int, int, int]):
+        return self.grid.GetInRect(rect)
+
+    #node closest to point (None if there is no node within maxDistance)
+    def GetNearestNode(self, pos:Vector2d, maxDistance:float = None, exclude:Node = None):
+        return self.grid.GetNearest(pos.x, pos.y, maxDistance, None if exclude == None else lambda node: node != exclude)
+
     #check if link between two nodes (any order) exists        
     def IsLinkExists(self, node1 : Node, node2 : Node):
-        for object in self.objects:
-            if type(object) == Link:
-                firstSame =            object.firstNode == node1
-                secondEqualsFirst =    object.secondNode == node1
-                firstEqualsSecond =    object.firstNode == node2
-                secondSame =           object.secondNode == node2
-
-                #There are no other possibble combinations
-                if  (firstSame and secondSame) or (firstEqualsSecond and secondEqualsFirst):
-                    return True
-        return False
+        #edge key is unordered, so both directions are covered by one lookup
+        return self.GetEdgeKey(node1, node2) in self.edges
 
     def CreateNode(self, pos:Vector2d, isCenter = True):
         newNode = Node(self)
@@ -381,70 +801,110 @@ class Graph:
             return True
         return False
 
+    #moves node to new top-left corner if it is valid place for it, returns True if node moved
+    def MoveNode(self, node:Node, pos:Vector2d):
+        prev_pos = node.pos
+        if pos.x == prev_pos.x and pos.y == prev_pos.y:
+            return False
+        node.pos = pos
+        if not self.IsValidNodePosition(node):
+            node.pos = prev_pos
+            return False
+        self.OnNodeMoved(node, prev_pos)
+        return True
+
     def FillWindow(self):
-        margin_size = Node.width//2
-        margin = Vector2d(margin_size, margin_size)
-        cell_size = Vector2d(Node.width + margin.x, Node.height + margin.y)
-        window_width = self.parent.width()
-        window_height = self.parent.height()
-
-        cell_pos = Vector2d()
-
-        while cell_pos.y<=window_height - Node.height:
-            while cell_pos.x <= window_width - Node.width:
-                self.CreateNode(cell_pos + margin, False)
-                cell_pos.x += cell_size.x
-            cell_pos.x = 0
-            cell_pos.y += cell_size.y
-                 
+        self.FillRegion((0, 0, self.width, self.height))
+
+    #top-left corners of nodes placed in lattice cells covering rect (x, y, width, height)
+    def GetLatticePositions(self, rect:tuple[int, int, int, int]):
+        margin = Node.defaultWidth//2
+        cell_width = Node.defaultWidth + margin
+        cell_height = Node.defaultHeight + margin
+        #lattice is aligned to world origin, so separately filled regions line up
+        left = -(-rect[0] // cell_width) * cell_width
+        top = -(-rect[1] // cell_height) * cell_height
+        columns = range(left, rect[0] + rect[2] - Node.defaultWidth + 1, cell_width)
+        rows = range(top, rect[1] + rect[3] - Node.defaultHeight + 1, cell_height)
+        xs = [x + margin for y in rows for x in columns]
+        ys = [y + margin for y in rows for x in columns]
+        return xs, ys
+
+    #fills rect with lattice of nodes, cells overlapping existing nodes are skipped
+    #returns number of created nodes
+    def FillRegion(self, rect:tuple[int, int, int, int]):
+        xs, ys = self.GetLatticePositions(rect)
+        #lattice cells never overlap each other, so checking against graph only is enough
+        valid = self.AreValidNodePositions(xs, ys)
+        nodes = []
+        for x, y, is_valid in zip(xs, ys, valid):
+            if is_valid:
+                node = Node(self)
+                node.pos = Vector2d(x, y)
+                nodes.append(node)
+        self.AddNodes(nodes)
+        return len(nodes)
 
     def StartCreatingLink(self, mouse_pos : Vector2d):
         underlyiing_node = self.GetObjectUnderMouse(mouse_pos, Node)
 
         if underlyiing_node:
             self.currentLink = Link(underlyiing_node)
+            self.MarkDirty(self.currentLink.GetBounds())
 
     def EndCreatingLink(self, mouse_pos : Vector2d):
         end_node = self.GetObjectUnderMouse(mouse_pos, Node)
+        #removing rubber band line, finished link is marked when added
+        self.MarkDirty(self.currentLink.GetBounds())
         if end_node and end_node != self.currentLink.firstNode:
             if not self.IsLinkExists(self.currentLink.firstNode, end_node):
                 self.currentLink.SetSecondNode(end_node)
                 self.AddLink(self.currentLink)
         self.currentLink = None
 
-    def ProcessInput(self, event : QInputEvent):
+    def ProcessInput(self, event : MouseEvent):
         result = False
-        mousePos = Vector2d(event.localPos().x(), event.localPos().y())
-        type = event.type()
+        mousePos = Vector2f(event.x, event.y)
+        type = event.type
         #processing all events that require knowledge about all objects
-        if type == QEvent.MouseButtonDblClick:
-            if event.button() == Qt.MouseButton.LeftButton:
+        if type == MouseEvent.DoubleClick:
+            if event.button == MouseEvent.LeftButton:
                 #creating new node
-                result |= self.CreateNode(mousePos)
+                result |= self.CreateNode(Vector2d(round(event.x), round(event.y)))
         
-        elif type == QEvent.MouseButtonPress:
+        elif type == MouseEvent.Press:
             #creating new link by dragging RMB
-            if event.button() == Qt.MouseButton.RightButton:
+            if event.button == MouseEvent.RightButton:
                 self.StartCreatingLink(mousePos)
                 result = True
             #removing elements with MMB
-            elif event.button() == Qt.MouseButton.MiddleButton:
+            elif event.button == MouseEvent.MiddleButton:
                 object = self.GetObjectUnderMouse(mousePos)
                 if object:
                     self.RemoveObject(object)
                     result = True
 
-        elif type == QEvent.MouseButtonRelease:
+        elif type == MouseEvent.Release:
             #finishing link creation process (updating in link itself)
             #it is here because it needs to know on what node it finished
-            if event.button() == Qt.MouseButton.RightButton:
+            if event.button == MouseEvent.RightButton:
                 if self.currentLink:
                     self.EndCreatingLink(mousePos)
                     result = True
         
         if self.currentLink:
-            result |= self.currentLink.ProcessInput(event)
-        for link in self.objects:
-            result |= link.ProcessInput(event)
+            prev_bounds = self.currentLink.GetBounds()
+            if self.currentLink.ProcessInput(event):
+                self.MarkDirty(UniteRects(prev_bounds, self.currentLink.GetBounds()))
+                result = True
+
+        #objects get only events they can react to, so idle mouse moves cost nothing:
+        #press goes to object under mouse, everything else - to node captured by dragging
+        if type == MouseEvent.Press:
+            target = self.GetObjectUnderMouse(mousePos)
+            if target:
+                result |= target.ProcessInput(event)
+        elif self.movingNode:
+            result |= self.movingNode.ProcessInput(event)
         return result
         
\ No newline at end of file
@@ -0,0 +1,286 @@
+#Qt layer of graph - rendering of model objects and conversion of Qt input events
+#graph model (GraphObjects) imports this module only when it renders something
+from Utils import *
+from GraphObjects import colors, Graph, Link, MouseEvent, Node
+from PyQt5.QtWidgets import QMessageBox
+from PyQt5.QtGui import QBrush, QColor, QColorConstants, QFont, QMouseEvent, QPainter, QPen
+from PyQt5.QtCore import QEvent, QLine, QPoint, QRect, Qt, QTimer
+from math import ceil
+import time
+
+#prebuilt Qt colors and brushes - creating them for every figure on every frame is slow
+#indexed by node color index (see Node.colorIndex)
+palette = [QColor(color) for color in colors]
+brushes = [QBrush(color) for color in palette]
+linkColor = QColor(Link.color)
+#pens for nodes rendered as points (level of detail) - cosmetic, so size doesn't depend on zoom
+def CreatePointPen(color:QColor):
+    pen = QPen(color, 3)
+    pen.setCosmetic(True)
+    return pen
+pointPens = [CreatePointPen(color) for color in palette]
+#result of topology query (path, component) - cosmetic, so outline is visible at any zoom
+highlightColor = QColor('#ff3030')
+highlightPen = QPen(highlightColor, 2)
+highlightPen.setCosmetic(True)
+highlightPointPen = QPen(highlightColor, 5)
+highlightPointPen.setCosmetic(True)
+#shades of cell density, from almost empty cell to the most populated one
+densityBrushes = [QBrush(QColor(90, 90, 140, alpha)) for alpha in range(40, 256, 24)]
+
+eventTypes = {
+    QEvent.MouseButtonPress : MouseEvent.Press,
+    QEvent.MouseButtonRelease : MouseEvent.Release,
+    QEvent.MouseMove : MouseEvent.Move,
+    QEvent.MouseButtonDblClick : MouseEvent.DoubleClick,
+}
+
+buttons = {
+    Qt.MouseButton.NoButton : MouseEvent.NoButton,
+    Qt.MouseButton.LeftButton : MouseEvent.LeftButton,
+    Qt.MouseButton.RightButton : MouseEvent.RightButton,
+    Qt.MouseButton.MiddleButton : MouseEvent.MiddleButton,
+}
+
+#converts Qt mouse event to model one, returns None for events model doesn't know
+def ConvertMouseEvent(event:QMouseEvent):
+    if not event.type() in eventTypes:
+        return None
+    pos = event.localPos()
+    return MouseEvent(eventTypes[event.type()], buttons.get(event.button(), MouseEvent.NoButton), pos.x(), pos.y())
+
+#paces graph updates by display frames instead of input events
+#events are queued and handed to onFrame once per frame, consecutive mouse moves are coalesced into the last one
+#so only the latest drag position is processed - input can never fall behind the display
+class FrameScheduler:
+    def __init__(self, onFrame, rate:int = 60):
+        #called with list of queued events, once per frame
+        self.onFrame = onFrame
+        self.events : list[MouseEvent] = []
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.Frame)
+        self.SetRate(rate)
+        #timer runs only while there is something to process
+        self.lastFrameTime = None
+
+        #statistics since last TakeStats
+        self.received = 0
+        self.coalesced = 0
+        self.frames = 0
+        self.droppedFrames = 0
+
+    def SetRate(self, rate:int):
+        self.interval = 1 / rate
+        self.timer.setInterval(max(1, round(1000 / rate)))
+
+    def Push(self, event:MouseEvent):
+        self.received += 1
+        #presses and releases keep their order, moves between them are merged
+        if event.type == MouseEvent.Move and self.events and self.events[-1].type == MouseEvent.Move:
+            self.events[-1] = event
+            self.coalesced += 1
+        else:
+            self.events.append(event)
+        self.Wake()
+
+    #requests frame without new event (e.g. hover position changed)
+    def Wake(self):
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def Frame(self):
+        now = time.perf_counter()
+        if self.lastFrameTime != None:
+            #frames that didn't happen because previous frame took too long
+            self.droppedFrames += max(0, int((now - self.lastFrameTime) / self.interval + 0.5) - 1)
+        self.lastFrameTime = now
+        self.frames += 1
+
+        events = self.events
+        self.events = []
+        self.onFrame(events)
+        if not self.events:
+            self.timer.stop()
+            self.lastFrameTime = None
+
+    #returns statistics and starts counting from zero
+    def TakeStats(self):
+        stats = {'frames' : self.frames, 'events' : self.received, 'coalesced' : self.coalesced, 'dropped' : self.droppedFrames}
+        self.received = 0
+        self.coalesced = 0
+        self.frames = 0
+        self.droppedFrames = 0
+        return stats
+
+#Creates Qt error message on error)
+def CreateWarningMessage(warning_message, details = ''):
+    msg = QMessageBox()
+    msg.setFont(QFont("Arial", 10))
+    msg.setIcon(QMessageBox.Critical)
+    msg.setWindowTitle("Error!")
+    msg.setText(warning_message)
+    msg.setInformativeText(details)
+    msg.setStandardButtons(QMessageBox.Ok)
+    msg.exec()
+
+#draws text on screen
+def DrawText(text: str, painter: QPainter, rect: QRect, flags, size = 8, color = QColorConstants.Black, ):
+    painter.save()
+    font = painter.font()
+    font.setPointSize(size)
+    painter.setFont(font)
+    painter.setPen(color)
+
+    painter.drawText(rect, flags, text)
+    painter.restore()
+
+#draws text in nice predefined semi-transparent frame
+#didn't do any style settings here for time economy, just predefined style =)
+def DrawTextFrame(message:str, mouse_pos:Vector2d, painter:QPainter = None):
+    painter.save()
+    width = text_frame_width
+    height = text_frame_height
+
+    hint_offset = Vector2d(text_frame_offset, text_frame_offset)
+    hint_pos = mouse_pos + hint_offset
+
+
+    text_margin = Vector2d(5, 0)
+    text_pos = hint_pos + text_margin
+
+    hint_rect:QRect = QRect(hint_pos.x, hint_pos.y, width, height)
+    text_rect:QRect = QRect(text_pos.x, text_pos.y, width - text_margin.x, height - text_margin.y)
+    r = 200
+    g = 200
+    b = 200
+    color =  QColor.fromRgbF(r/255, g / 255, b / 255, 0.5)
+    painter.setBrush(color)
+    painter.setPen(QColorConstants.Black)
+
+    painter.drawRect(hint_rect)
+    
+    DrawText(message, painter, text_rect, Qt.AlignLeft | Qt.AlignVCenter)
+    painter.restore()
+
+def ShowHint(painter:QPainter, hint_text:str, mouse_pos:Vector2d):
+    DrawTextFrame(hint_text, mouse_pos, painter)
+
+def RenderNode(painter:QPainter, node:Node):
+    painter.save()
+    painter.setPen(palette[node.colorIndex])
+    painter.setBrush(brushes[node.colorIndex])
+    painter.drawRect(node.pos.x, node.pos.y, node.width, node.height)
+    painter.restore()
+
+def RenderLink(painter:QPainter, link:Link):
+    painter.save()
+    painter.setPen(linkColor)
+    start = link.GetStartPoint()         
+    end = link.GetEndPoint()
+    painter.drawLine(start.x, start.y, end.x, end.y)
+    painter.restore()
+
+# renders visualization of objects grid on screen (just for hint)
+# rect limits rendering to part of the screen
+def RenderGrid(painter:QPainter, graph:Graph, rect:tuple[int, int, int, int] = None):
+    #cosmetic pen - grid lines stay thin at any zoom
+    painter.setPen(QPen(QColorConstants.LightGray, 0))
+    if rect == None:
+        rect = (0, 0, graph.width, graph.height)
+    left = max(rect[0], 0)
+    top = max(rect[1], 0)
+    right = min(rect[0] + rect[2], graph.width)
+    bottom = min(rect[1] + rect[3], graph.height)
+    #first grid lines inside rect
+    x = ceil(left / Graph.gridSize) * Graph.gridSize
+    y = ceil(top / Graph.gridSize) * Graph.gridSize
+    while y < bottom:
+        painter.drawLine(left, y, right, y)
+        y += Graph.gridSize
+
+    while x < right:
+        painter.drawLine(x, top, x, bottom)
+        x += Graph.gridSize 
+
+# renders figures in batches instead of figure by figure: all links with one call
+# and nodes with one call per color (nodes never overlap, so order between colors doesn't matter)
+# asPoints - nodes are rendered as points of their centers (level of detail at low zoom)
+def RenderBatch(painter:QPainter, links:list[Link], nodes:list[Node], asPoints = False):
+    painter.save()
+    RenderLinks(painter, links)
+    if asPoints:
+        RenderNodePoints(painter, nodes)
+    else:
+        RenderNodes(painter, nodes)
+    painter.restore()
+
+def RenderLinks(painter:QPainter, links:list[Link]):
+    lines = []
+    for link in links:
+        start = link.GetStartPoint()
+        end = link.GetEndPoint()
+        lines.append(QLine(start.x, start.y, end.x, end.y))
+    if lines:
+        painter.setPen(linkColor)
+        painter.drawLines(lines)
+
+def RenderNodes(painter:QPainter, nodes:list[Node]):
+    color_rects : dict[int, list[QRect]] = {}
+    for node in nodes:
+        if not node.colorIndex in color_rects:
+            color_rects[node.colorIndex] = []
+        color_rects[node.colorIndex].append(QRect(node.pos.x, node.pos.y, node.width, node.height))
+    for color, rects in color_rects.items():
+        painter.setPen(palette[color])
+        painter.setBrush(brushes[color])
+        painter.drawRects(rects)
+
+def RenderNodePoints(painter:QPainter, nodes:list[Node]):
+    color_points : dict[int, list[QPoint]] = {}
+    for node in nodes:
+        if not node.colorIndex in color_points:
+            color_points[node.colorIndex] = []
+        center = node.GetCenter()
+        color_points[node.colorIndex].append(QPoint(center.x, center.y))
+    for color, points in color_points.items():
+        painter.setPen(pointPens[color])
+        painter.drawPoints(points)
+
+# renders highlighted links and outlines of highlighted nodes over already rendered figures
+def RenderHighlight(painter:QPainter, links:list[Link], nodes:list[Node], asPoints = False):
+    painter.save()
+    painter.setPen(highlightPen)
+    painter.setBrush(Qt.NoBrush)
+    lines = []
+    for link in links:
+        start = link.GetStartPoint()
+        end = link.GetEndPoint()
+        lines.append(QLine(start.x, start.y, end.x, end.y))
+    if lines:
+        painter.drawLines(lines)
+    if asPoints:
+        painter.setPen(highlightPointPen)
+        painter.drawPoints([QPoint(node.GetCenter().x, node.GetCenter().y) for node in nodes])
+    elif nodes:
+        painter.drawRects([QRect(node.pos.x, node.pos.y, node.width, node.height) for node in nodes])
+    painter.restore()
+
+# renders grid cells shaded by number of nodes in them (level of detail at very low zoom)
+# cells - pairs of cell index and number of nodes in it
+def RenderDensity(painter:QPainter, cells:list[tuple[tuple[int, int], int]], cellSize:int):
+    if not cells:
+        return
+    largest = max(count for cell, count in cells)
+    shade_rects : list[list[QRect]] = [[] for brush in densityBrushes]
+    for (i, j), count in cells:
+        shade = (count * len(densityBrushes) - 1) // largest
+        shade_rects[shade].append(QRect(i * cellSize, j * cellSize, cellSize, cellSize))
+    painter.save()
+    painter.setPen(Qt.NoPen)
+    for brush, rects in zip(densityBrushes, shade_rects):
+        if rects:
+            painter.setBrush(brush)
+            painter.drawRects(rects)
+    painter.restore()
@@ -0,0 +1,123 @@
+#alternative rendering backend - nodes and links are mirrored into items of QGraphicsScene
+#scene keeps them in BSP tree, so rendering of part of graph and picking only visit items near given area
+#graph forwards every change to scene (see Graph.SetScene), items are never rebuilt as a whole
+from Utils import *
+from GraphObjects import Graph, Link, Node
+from GraphQt import brushes, highlightPen, linkColor, palette
+from PyQt5.QtWidgets import QGraphicsLineItem, QGraphicsRectItem, QGraphicsScene
+from PyQt5.QtGui import QPen
+from PyQt5.QtCore import QRectF, Qt
+
+#item pens - one per color index, shared by all items
+nodePens = [QPen(color, 1) for color in palette]
+linkPen = QPen(linkColor, 1)
+
+
+class GraphScene:
+    def __init__(self):
+        self.scene = QGraphicsScene()
+        self.scene.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        self.graph: Graph = None
+        #figure -> its item
+        self.items : dict = {}
+        #node which is dragged now - it and its links are hidden, graph renders them on top (see Graph.RenderActive)
+        self.activeNode: Node = None
+        self.highlighted : set = set()
+
+    #fills scene with all figures of graph, graph forwards its changes from now on
+    def Build(self, graph:Graph):
+        self.graph = graph
+        self.SetBounds(graph.width, graph.height)
+        self.AddNodes(list(graph.nodes))
+        self.AddLinks(list(graph.links))
+        if graph.movingNode != None:
+            self.SetActive(graph.movingNode, True)
+        self.SetHighlight(graph.highlightedNodes, graph.highlightedLinks)
+
+    def Clear(self):
+        self.scene.clear()
+        self.items = {}
+        self.activeNode = None
+        self.highlighted = set()
+        self.graph = None
+
+    def SetBounds(self, width:int, height:int):
+        self.scene.setSceneRect(0, 0, width, height)
+
+    #stacking order is the same as in graph - nodes over links, newer nodes over older ones, older links over newer ones
+    def AddNodes(self, nodes:list[Node]):
+        sequences = self.graph.nodes
+        for node in nodes:
+            item = QGraphicsRectItem(node.pos.x, node.pos.y, node.width, node.height)
+            item.setPen(nodePens[node.colorIndex])
+            item.setBrush(brushes[node.colorIndex])
+            item.setZValue(sequences[node])
+            item.setData(0, node)
+            self.scene.addItem(item)
+            self.items[node] = item
+
+    def AddLinks(self, links:list[Link]):
+        sequences = self.graph.links
+        for link in links:
+            start = link.GetStartPoint()
+            end = link.GetEndPoint()
+            item = QGraphicsLineItem(start.x, start.y, end.x, end.y)
+            item.setPen(linkPen)
+            item.setZValue(-sequences[link])
+            item.setData(0, link)
+            self.scene.addItem(item)
+            self.items[link] = item
+
+    def Remove(self, figure):
+        item = self.items.pop(figure)
+        self.scene.removeItem(item)
+        self.highlighted.discard(figure)
+        if figure == self.activeNode:
+            self.activeNode = None
+
+    #node position changed - its item and items of its links follow it
+    def MoveNode(self, node:Node):
+        self.items[node].setRect(node.pos.x, node.pos.y, node.width, node.height)
+        for link in self.graph.adjacency[node]:
+            start = link.GetStartPoint()
+            end = link.GetEndPoint()
+            self.items[link].setLine(start.x, start.y, end.x, end.y)
+
+    #dragged node is taken out of scene render, the same way it is taken out of static figures
+    def SetActive(self, node:Node, active:bool):
+        self.activeNode = node if active else None
+        self.items[node].setVisible(not active)
+        for link in self.graph.adjacency[node]:
+            self.items[link].setVisible(not active)
+
+    def SetHighlight(self, nodes, links):
+        for figure in self.highlighted:
+            self.items[figure].setPen(nodePens[figure.colorIndex] if type(figure) == Node else linkPen)
+        self.highlighted = set(nodes) | set(links)
+        for figure in self.highlighted:
+            self.items[figure].setPen(highlightPen)
+
+    #renders items intersecting rect (x, y, width, height), painter is in graph coordinates
+    def Render(self, painter, rect:tuple[int, int, int, int]):
+        area = QRectF(*rect)
+        self.scene.render(painter, area, area)
+
+    #top-most figure under point (nodes first), items near point are taken from BSP tree
+    def GetObjectAt(self, point:Vector2d, offset:int, filter_type = None):
+        area = QRectF(point.x - offset, point.y - offset, offset * 2, offset * 2)
+        candidates = {item.data(0) for item in self.scene.items(area, Qt.IntersectsItemBoundingRect)}
+        #hidden items of dragged node may be skipped by scene, they are still under mouse
+        if self.activeNode != None:
+            candidates.add(self.activeNode)
+            candidates.update(self.graph.adjacency[self.activeNode])
+        for figure_type in (Node, Link):
+            if filter_type != None and filter_type != figure_type:
+                continue
+            top = None
+            for figure in candidates:
+                if type(figure) == figure_type and figure.IsIntersectingPoint(point, offset):
+                    if top == None or self.items[figure].zValue() > self.items[top].zValue():
+                        top = figure
+            if top != None:
+                return top
+        return None
@@ -0,0 +1,324 @@
+#streaming import of topology exports - edge list CSV and GraphML, node coordinates are optional
+#file is read by pipeline of generators (lines -> records -> graph), so it is never loaded whole
+#records are:
+#  (NodeRecord, id, x, y) - node with coordinates (x, y are None if it has none)
+#  (EdgeRecord, source id, target id)
+#  python Importer.py file.csv|file.graphml [--output graph.bin]
+import argparse
+import csv
+import gc
+import os
+import xml.etree.ElementTree as ElementTree
+from itertools import chain
+from GraphObjects import *
+from SpatialHash import SpatialHash
+
+NodeRecord = 'node'
+EdgeRecord = 'edge'
+
+#counter of bytes read, shared by reading generator and importer (progress)
+class ReadPosition:
+    def __init__(self):
+        self.bytes = 0
+
+#lines of text file, position counts bytes of lines already given away
+def ReadLines(file, position:ReadPosition):
+    for line in file:
+        position.bytes += len(line)
+        yield line.decode('utf-8', 'replace')
+
+def GetDelimiter(line:str):
+    for delimiter in (',', ';', '\t'):
+        if delimiter in line:
+            return delimiter
+    return None
+
+def ParseCoordinate(text:str):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+#csv module reports broken rows (e.g. too long field) with its own error - it is turned into ValueError like other format errors
+def ReadRows(rows):
+    try:
+        yield from rows
+    except csv.Error as error:
+        raise ValueError('Broken edge list: ' + str(error)) from error
+
+#edge list - "source,target" per line, optionally followed by source_x, source_y, target_x, target_y
+#header line with 'source' and 'target' columns may name columns in any order, lines starting with # are comments
+#comma, semicolon, tab and whitespace separated files are accepted
+def ReadEdgeList(lines):
+    lines = (line for line in lines if line.strip() and line.lstrip()[0] != '#')
+    first = next(lines, None)
+    if first == None:
+        return
+    delimiter = GetDelimiter(first)
+    lines = chain([first], lines)
+    rows = ReadRows(csv.reader(lines, delimiter=delimiter)) if delimiter else (line.split() for line in lines)
+    columns = None
+    for row in rows:
+        if columns == None:
+            names = [value.strip().lower() for value in row]
+            columns = {name : index for index, name in enumerate(names)}
+            if 'source' in columns and 'target' in columns:
+                continue
+            #no header - columns go in default order
+            columns = {name : index for index, name in enumerate(('source', 'target', 'source_x', 'source_y', 'target_x', 'target_y'))}
+        #header may put source and target anywhere, rows too short for them are skipped
+        if len(row) <= max(columns['source'], columns['target']):
+            continue
+        source = row[columns['source']].strip()
+        target = row[columns['target']].strip()
+        coordinates = [columns.get(name) for name in ('source_x', 'source_y', 'target_x', 'target_y')]
+        if not None in coordinates and max(coordinates) < len(row):
+            values = [ParseCoordinate(row[index]) for index in coordinates]
+            if not None in values:
+                yield NodeRecord, source, values[0], values[1]
+                yield NodeRecord, target, values[2], values[3]
+        yield EdgeRecord, source, target
+
+def GetLocalName(tag:str):
+    return tag.rsplit('}', 1)[-1]
+
+#GraphML - nodes may have data for keys named x and y, elements are dropped as soon as they are processed
+def ReadGraphML(file):
+    #key id -> 'x' or 'y'
+    coordinate_keys = {}
+    #open elements - processed node or edge is removed from its parent, otherwise tree keeps growing with file
+    parents = []
+    for event, element in ElementTree.iterparse(file, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element)
+            continue
+        parents.pop()
+        tag = GetLocalName(element.tag)
+        if tag == 'key':
+            name = element.get('attr.name', '').lower()
+            if name in ('x', 'y'):
+                coordinate_keys[element.get('id')] = name
+        elif tag == 'node':
+            position = {}
+            for data in element:
+                if GetLocalName(data.tag) == 'data' and data.get('key') in coordinate_keys:
+                    position[coordinate_keys[data.get('key')]] = ParseCoordinate(data.text or '')
+            yield NodeRecord, element.get('id'), position.get('x'), position.get('y')
+            if parents:
+                parents[-1].remove(element)
+        elif tag == 'edge':
+            yield EdgeRecord, element.get('source'), element.get('target')
+            if parents:
+                parents[-1].remove(element)
+
+#file object counting bytes read by parser
+class CountingFile:
+    def __init__(self, file, position:ReadPosition):
+        self.file = file
+        self.position = position
+
+    def read(self, size = -1):
+        data = self.file.read(size)
+        self.position.bytes += len(data)
+        return data
+
+def IsGraphML(path:str):
+    return os.path.splitext(path)[1].lower() in ('.graphml', '.xml')
+
+#builds graph from file step by step - ui can show and edit graph between steps (same interface as GraphFile.GraphReader)
+#nodes are created on first mention, nodes without coordinates (or with invalid ones) are put on lattice in order
+#of their appearance - nodes mentioned together (usually linked) end up close to each other
+class GraphImporter:
+    #cells around node where its new neighbour is put, closest first
+    nearOffsets = sorted(((dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if dx or dy), key=lambda offset: offset[0] ** 2 + offset[1] ** 2)
+
+    #width, height - area of new graph, it grows down when lattice doesn't fit
+    def __init__(self, path:str, width:int, height:int):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.file = open(path, 'rb')
+        self.position = ReadPosition()
+        if IsGraphML(path):
+            self.records = ReadGraphML(CountingFile(self.file, self.position))
+        else:
+            self.records = ReadEdgeList(ReadLines(self.file, self.position))
+        self.graph = Graph(width, height)
+        #file id -> node
+        self.nodes : dict[str, Node] = {}
+        #unordered pairs of ids of links already created - replaces IsLinkExists check for every edge
+        self.edges : set[tuple[str, str]] = set()
+        #lattice for nodes without coordinates - cells taken by nodes and next cell to try when there is no neighbour
+        self.latticeMargin = Node.defaultWidth//2
+        self.cellWidth = Node.defaultWidth + self.latticeMargin
+        self.cellHeight = Node.defaultHeight + self.latticeMargin
+        self.latticeColumns = max(1, (width - self.latticeMargin) // self.cellWidth)
+        self.latticeCells : set[tuple[int, int]] = set()
+        self.latticeIndex = 0
+        self.finished = False
+
+        #nodes and links waiting for bulk insertion at the end of chunk
+        self.pendingNodes : list[Node] = []
+        self.pendingLinks : list[Link] = []
+        #pending nodes are not in graph grid yet - new nodes are checked against this one too
+        self.pendingGrid = SpatialHash(Graph.gridSize)
+
+        #what was skipped, for report
+        self.duplicates = 0
+        self.selfLoops = 0
+        self.placed = 0
+
+    def IsFinished(self):
+        return self.finished
+
+    def GetProgress(self):
+        return 1 if self.finished or self.size == 0 else min(self.position.bytes / self.size, 1)
+
+    #processes up to count records, returns True when file is read
+    def ReadChunk(self, count:int):
+        #chunk creates lots of objects and no garbage - collector would scan all of them again and again
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            processed = 0
+            for record in self.records:
+                if record[0] == NodeRecord:
+                    self.AddNode(*record[1:])
+                else:
+                    self.AddEdge(*record[1:])
+                processed += 1
+                if processed == count:
+                    break
+            else:
+                self.Finish()
+        except (ValueError, SyntaxError):
+            #broken file - records read before error are still added
+            self.Finish()
+            raise
+        finally:
+            self.Flush()
+            if collecting:
+                gc.enable()
+        return self.finished
+
+    def Finish(self):
+        self.finished = True
+        self.file.close()
+
+    def Flush(self):
+        if self.pendingNodes:
+            self.graph.AddNodes(self.pendingNodes)
+            self.pendingNodes = []
+            self.pendingGrid = SpatialHash(Graph.gridSize)
+        if self.pendingLinks:
+            self.graph.AddLinks(self.pendingLinks)
+            self.pendingLinks = []
+
+    #node for id, created on first mention
+    #near - linked node, new node without coordinates is put next to it
+    def GetNode(self, id:str, x:float = None, y:float = None, near:Node = None):
+        node = self.nodes.get(id)
+        if node != None:
+            return node
+        node = Node(self.graph)
+        if x == None or y == None or not self.IsFreePosition(node, Vector2d(x, y)):
+            self.PlaceOnLattice(node, near)
+        self.pendingNodes.append(node)
+        self.pendingGrid.Insert(node)
+        self.nodes[id] = node
+        return node
+
+    #puts node to position if it doesn't intersect nodes of graph and nodes waiting for insertion
+    def IsFreePosition(self, node:Node, pos:Vector2d):
+        node.pos = pos
+        if not self.graph.IsValidNodePosition(node):
+            return False
+        for other in self.pendingGrid.GetCandidates((pos.x, pos.y, node.width, node.height)):
+            if node.IsIntersectingOther(other):
+                return False
+        return True
+
+    #lattice cell of node, also for nodes placed by coordinates
+    def GetLatticeCell(self, node:Node):
+        return ((node.pos.x - self.latticeMargin) // self.cellWidth, (node.pos.y - self.latticeMargin) // self.cellHeight)
+
+    #puts node to lattice cell if it is free, area grows down when cell is below it
+    def TryLatticeCell(self, node:Node, cell:tuple[int, int]):
+        if cell in self.latticeCells or not 0 <= cell[0] < self.latticeColumns or cell[1] < 0:
+            return False
+        pos = Vector2d(cell[0] * self.cellWidth + self.latticeMargin, cell[1] * self.cellHeight + self.latticeMargin)
+        if pos.y + node.height > self.graph.height:
+            self.graph.SetBounds(self.graph.width, pos.y + self.cellHeight)
+        #cells never overlap each other, only nodes with coordinates can be in the way
+        if not self.IsFreePosition(node, pos):
+            return False
+        self.latticeCells.add(cell)
+        self.placed += 1
+        return True
+
+    #node goes to free cell next to near node if there is one, otherwise to next free cell (row by row)
+    #rows below all nodes are always free as area grows down, so search ends one row below bottom of area
+    def PlaceOnLattice(self, node:Node, near:Node = None):
+        if near != None:
+            column, row = self.GetLatticeCell(near)
+            for dx, dy in self.nearOffsets:
+                if self.TryLatticeCell(node, (column + dx, row + dy)):
+                    return
+        #taken before search - trying cells below area grows it
+        last = (self.graph.height // self.cellHeight + 2) * self.latticeColumns
+        while self.latticeIndex < last:
+            row, column = divmod(self.latticeIndex, self.latticeColumns)
+            self.latticeIndex += 1
+            if self.TryLatticeCell(node, (column, row)):
+                return
+        raise ValueError(f'No free lattice cell: area width {self.graph.width} is less than lattice cell {self.cellWidth + self.latticeMargin}')
+
+    def AddNode(self, id:str, x:float = None, y:float = None):
+        self.GetNode(id, x, y)
+
+    def AddEdge(self, source:str, target:str):
+        if source == target:
+            self.selfLoops += 1
+            return
+        key = (source, target) if source < target else (target, source)
+        if key in self.edges:
+            self.duplicates += 1
+            return
+        self.edges.add(key)
+        first = self.GetNode(source)
+        self.pendingLinks.append(Link(first, self.GetNode(target, near=first)))
+
+    def GetReport(self):
+        return {'nodes' : len(self.graph.nodes), 'links' : len(self.graph.links), 'placed_on_lattice' : self.placed,
+                'duplicate_edges' : self.duplicates, 'self_loops' : self.selfLoops}
+
+#imports whole file, onProgress is called with part of file read (0..1) after every chunk
+def Import(path:str, width:int, height:int, chunkSize:int = 65536, onProgress = None):
+    importer = GraphImporter(path, width, height)
+    while not importer.ReadChunk(chunkSize):
+        if onProgress != None:
+            onProgress(importer.GetProgress())
+    return importer
+
+def main():
+    import json
+    import sys
+    import time
+    parser = argparse.ArgumentParser(description='Imports edge list CSV or GraphML file')
+    parser.add_argument('file')
+    parser.add_argument('--width', type=int, default=8000, help='width of graph area, height grows as needed')
+    parser.add_argument('--output', help='save imported graph to binary graph file (see GraphFile)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    importer = Import(args.file, args.width, args.width, onProgress=lambda progress: print(f'\r{progress * 100:.0f}%', end='', file=sys.stderr))
+    print(file=sys.stderr)
+    report = importer.GetReport()
+    report['seconds'] = time.perf_counter() - start
+    if args.output:
+        import GraphFile
+        GraphFile.Save(importer.graph, args.output)
+    json.dump(report, sys.stdout, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+#autosave - every change of graph is appended to binary journal, journal is compacted into snapshot (see GraphFile) from time to time
+#on startup latest snapshot is loaded and journal written after it is replayed, so at most last flush interval of edits is lost on crash
+#  directory: snapshot_<generation>.bin, its node ids snapshot_<generation>.ids and journal_<generation>.log,
+#  only files of latest generation with snapshot are used
+#  journal: magic and version, then records - type byte and fixed fields of that type (see recordTypes)
+#nodes are referred to by ids known only to journal - given in AddNode record, kept by snapshots (uint32 per node in ids file)
+#records are packed in ui thread and only queued there, writer thread writes them by batches
+#journal keeps its own columns of figures by id, so snapshot is taken by copying arrays, writer thread makes file of them
+#numpy is optional - without it (see GraphFile) there is no autosave
+import collections
+import gc
+import os
+import struct
+import threading
+import GraphFile
+from GraphObjects import *
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+available = GraphFile.available
+
+magic = b'GJRN'
+version = 1
+header = struct.Struct('<4sI')
+
+AddNodeRecord = 1
+RemoveNodeRecord = 2
+AddLinkRecord = 3
+RemoveLinkRecord = 4
+MoveNodeRecord = 5
+#record type -> fields after type byte
+recordTypes = {
+    AddNodeRecord : struct.Struct('<IiiiiB'),  #id, x, y, width, height, color index
+    RemoveNodeRecord : struct.Struct('<I'),    #id
+    AddLinkRecord : struct.Struct('<II'),      #ids of first and second node
+    RemoveLinkRecord : struct.Struct('<II'),   #ids of first and second node
+    MoveNodeRecord : struct.Struct('<Iii'),    #id, x, y
+}
+recordPacks = {record_type : struct.Struct('<B' + fields.format[1:]).pack for record_type, fields in recordTypes.items()}
+
+
+def GetSnapshotPath(directory:str, generation:int):
+    return os.path.join(directory, f'snapshot_{generation}.bin')
+
+def GetIdsPath(directory:str, generation:int):
+    return os.path.join(directory, f'snapshot_{generation}.ids')
+
+def GetJournalPath(directory:str, generation:int):
+    return os.path.join(directory, f'journal_{generation}.log')
+
+#generations of all files in directory, newest first
+def GetGenerations(directory:str, prefix:str):
+    generations = []
+    for name in os.listdir(directory):
+        stem, extension = os.path.splitext(name)
+        if stem.startswith(prefix) and stem[len(prefix):].isdigit() and extension in ('.bin', '.ids', '.log'):
+            generations.append(int(stem[len(prefix):]))
+    return sorted(generations, reverse=True)
+
+#applies records to graph, consecutive added nodes and links are inserted in bulk
+#moves are applied after all other records, only last position of every node - positions don't affect other records
+#nodes - id -> node, it is kept up to date with records
+#returns end of valid part of data (torn tail of crashed write is skipped) and number of records
+def Replay(graph:Graph, nodes:dict, data:bytes, offset:int):
+    added_nodes = []
+    added_links = []
+    #id -> last position
+    moves = {}
+    def AddNodes():
+        if added_nodes:
+            graph.AddNodes(added_nodes)
+            added_nodes.clear()
+    def AddLinks():
+        if added_links:
+            graph.AddLinks(added_links)
+            added_links.clear()
+
+    size = len(data)
+    count = 0
+    while offset < size:
+        record_type = data[offset]
+        fields = recordTypes.get(record_type)
+        if fields == None or offset + 1 + fields.size > size:
+            break
+        values = fields.unpack_from(data, offset + 1)
+        offset += 1 + fields.size
+        count += 1
+        if record_type == AddNodeRecord:
+            AddLinks()
+            id, x, y, width, height, color = values
+            node = Node(graph, width, height, color)
+            node.pos = Vector2d(x, y)
+            nodes[id] = node
+            added_nodes.append(node)
+            continue
+        AddNodes()
+        if record_type == AddLinkRecord:
+            first = nodes.get(values[0])
+            second = nodes.get(values[1])
+            if first != None and second != None and first != second and not graph.IsLinkExists(first, second):
+                added_links.append(Link(first, second))
+            continue
+        AddLinks()
+        if record_type == RemoveNodeRecord:
+            node = nodes.pop(values[0], None)
+            moves.pop(values[0], None)
+            if node != None:
+                graph.RemoveNode(node)
+        elif record_type == RemoveLinkRecord:
+            first = nodes.get(values[0])
+            second = nodes.get(values[1])
+            link = graph.edges.get(Graph.GetEdgeKey(first, second)) if first != None and second != None else None
+            if link != None:
+                graph.RemoveLink(link)
+        elif record_type == MoveNodeRecord:
+            moves[values[0]] = (values[1], values[2])
+    AddNodes()
+    AddLinks()
+    for id, (x, y) in moves.items():
+        node = nodes.get(id)
+        if node != None and (node.pos.x != x or node.pos.y != y):
+            prev_pos = node.pos
+            node.pos = Vector2d(x, y)
+            graph.OnNodeMoved(node, prev_pos)
+    return offset, count
+
+
+class Journal:
+    #queued records are written and synced to disk this often (seconds)
+    flushInterval = 0.2
+    #journal is worth compacting when it has more records than this and than figures in graph
+    compactRecords = 100000
+
+    def __init__(self, directory:str):
+        self.directory = directory
+        self.graph: Graph = None
+        #node -> id used in records
+        self.ids : dict = {}
+        self.nextId = 0
+        #generation of latest queued snapshot, writer thread gets it only with queued snapshot
+        self.generation = 0
+        #records since last snapshot
+        self.recordCount = 0
+        #graph returned by Restore - it continues existing journal instead of starting new snapshot
+        self.restored: Graph = None
+
+        #state of graph as journaled - node columns by id (first self.nextId items), link columns by slot
+        self.x = self.y = self.width = self.height = self.color = self.alive = None
+        self.first = self.second = None
+        self.links : list[Link] = []
+        self.linkSlots : dict = {}
+
+        #packed records and snapshots for writer, appended by ui thread only, taken by writer only
+        self.queue = collections.deque()
+        self.thread: threading.Thread = None
+        self.stopping = threading.Event()
+        #error of writer thread, nothing is written after it
+        self.error: Exception = None
+
+    #loads latest snapshot and replays its journal, returns graph or None if there is nothing saved
+    #graph is not journaled until Start
+    def Restore(self):
+        os.makedirs(self.directory, exist_ok=True)
+        generations = [generation for generation in GetGenerations(self.directory, 'snapshot_')
+                       if os.path.exists(GetSnapshotPath(self.directory, generation))]
+        if not generations:
+            return None
+        generation = generations[0]
+        reader = GraphFile.GraphReader(GetSnapshotPath(self.directory, generation))
+        while not reader.ReadChunk(65536):
+            pass
+        graph = reader.graph
+        ids_path = GetIdsPath(self.directory, generation)
+        if os.path.exists(ids_path):
+            nodes = dict(zip(np.fromfile(ids_path, np.uint32).tolist(), reader.nodes))
+        else:
+            nodes = dict(enumerate(reader.nodes))
+        #mapped columns are released, so snapshot can be deleted by later compaction
+        del reader
+
+        path = GetJournalPath(self.directory, generation)
+        record_count = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                data = file.read()
+            if len(data) < header.size or header.unpack_from(data) != (magic, version):
+                raise ValueError('Not a journal file: ' + path)
+            collecting = gc.isenabled()
+            gc.disable()
+            try:
+                end, record_count = Replay(graph, nodes, data, header.size)
+            finally:
+                if collecting:
+                    gc.enable()
+            #new records must not be appended after half-written one
+            if end < len(data):
+                os.truncate(path, end)
+
+        graph.TakeDirtyRects()
+        self.generation = generation
+        self.SetState(graph, {node : id for id, node in nodes.items()})
+        self.recordCount = record_count
+        self.restored = graph
+        return graph
+
+    #journals all changes of graph from now on, previous graph is not journaled anymore
+    #graph returned by Restore continues its journal, any other graph is written as new snapshot first
+    def Start(self, graph:Graph):
+        if self.graph != None:
+            self.graph.journal = None
+        os.makedirs(self.directory, exist_ok=True)
+        self.graph = graph
+        graph.journal = self
+        if graph != self.restored:
+            self.SetState(graph, {node : id for id, node in enumerate(graph.nodes)})
+            self.Compact()
+        self.restored = None
+        if self.thread == None:
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.Run, args=(self.generation,), name='journal', daemon=True)
+            self.thread.start()
+
+    #writes everything queued and stops writer thread
+    def Close(self):
+        if self.graph != None:
+            self.graph.journal = None
+            self.graph = None
+        if self.thread != None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    #fills columns from graph, ids - node -> id
+    def SetState(self, graph:Graph, ids:dict):
+        self.ids = ids
+        self.nextId = max(ids.values(), default=-1) + 1
+        capacity = max(1024, self.nextId)
+        self.x = np.zeros(capacity, np.int32)
+        self.y = np.zeros(capacity, np.int32)
+        self.width = np.zeros(capacity, np.int32)
+        self.height = np.zeros(capacity, np.int32)
+        self.color = np.zeros(capacity, np.uint8)
+        self.alive = np.zeros(capacity, bool)
+        slots = np.fromiter(ids.values(), np.int64, len(ids))
+        nodes = list(ids)
+        self.x[slots] = [node.pos.x for node in nodes]
+        self.y[slots] = [node.pos.y for node in nodes]
+        self.width[slots] = [node.width for node in nodes]
+        self.height[slots] = [node.height for node in nodes]
+        self.color[slots] = [node.colorIndex for node in nodes]
+        self.alive[slots] = True
+        self.links = list(graph.links)
+        self.linkSlots = {link : slot for slot, link in enumerate(self.links)}
+        self.first = np.zeros(max(1024, len(self.links)), np.uint32)
+        self.second = np.zeros(len(self.first), np.uint32)
+        self.first[:len(self.links)] = [ids[link.firstNode] for link in self.links]
+        self.second[:len(self.links)] = [ids[link.secondNode] for link in self.links]
+
+    #makes room for node ids below count
+    def GrowNodes(self, count:int):
+        capacity = len(self.x)
+        while capacity < count:
+            capacity *= 2
+        for name in ('x', 'y', 'width', 'height', 'color', 'alive'):
+            old = getattr(self, name)
+            if len(old) < capacity:
+                new = np.zeros(capacity, old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+
+    #ids of removed nodes are not reused - ids are made dense again when there are more unused ones than used
+    #O(nodes), but only after as many nodes were removed
+    def Renumber(self):
+        used = np.flatnonzero(self.alive[:self.nextId])
+        new_ids = np.zeros(self.nextId, np.uint32)
+        new_ids[used] = np.arange(len(used))
+        remap = new_ids.tolist()
+        self.ids = {node : remap[id] for node, id in self.ids.items()}
+        for name in ('x', 'y', 'width', 'height', 'color', 'alive'):
+            column = getattr(self, name)
+            column[:len(used)] = column[used]
+        self.alive[len(used):self.nextId] = False
+        count = len(self.links)
+        self.first[:count] = new_ids[self.first[:count]]
+        self.second[:count] = new_ids[self.second[:count]]
+        self.nextId = len(used)
+
+    def NeedsCompaction(self):
+        graph = self.graph
+        return graph != None and self.recordCount > max(self.compactRecords, len(graph.nodes) + len(graph.links))
+
+    #queues snapshot of graph as journaled, journal starts from empty after it
+    #only copies of columns are taken here, writer thread makes snapshot file of them
+    def Compact(self):
+        if self.nextId > max(self.compactRecords, len(self.ids) * 2):
+            self.Renumber()
+        count = self.nextId
+        columns = {name : getattr(self, name)[:count].copy() for name in ('x', 'y', 'width', 'height', 'color', 'alive')}
+        columns['first'] = self.first[:len(self.links)].copy()
+        columns['second'] = self.second[:len(self.links)].copy()
+        self.generation += 1
+        self.recordCount = 0
+        self.queue.append((self.generation, self.graph.width, self.graph.height, columns))
+
+    #hooks called by graph (see Graph.journal)
+    def AddNodes(self, nodes:list[Node]):
+        first = self.nextId
+        last = first + len(nodes)
+        if last > len(self.x):
+            self.GrowNodes(last)
+        ids = self.ids
+        pack = recordPacks[AddNodeRecord]
+        records = []
+        for id, node in enumerate(nodes, first):
+            ids[node] = id
+            records.append(pack(AddNodeRecord, id, node.pos.x, node.pos.y, node.width, node.height, node.colorIndex))
+        self.x[first:last] = [node.pos.x for node in nodes]
+        self.y[first:last] = [node.pos.y for node in nodes]
+        self.width[first:last] = [node.width for node in nodes]
+        self.height[first:last] = [node.height for node in nodes]
+        self.color[first:last] = [node.colorIndex for node in nodes]
+        self.alive[first:last] = True
+        self.nextId = last
+        self.queue.append(b''.join(records))
+        self.recordCount += len(nodes)
+
+    def AddLinks(self, links:list[Link]):
+        ids = self.ids
+        first = len(self.links)
+        last = first + len(links)
+        while last > len(self.first):
+            for name in ('first', 'second'):
+                old = getattr(self, name)
+                new = np.zeros(len(old) * 2, old.dtype)
+                new[:first] = old[:first]
+                setattr(self, name, new)
+        first_ids = [ids[link.firstNode] for link in links]
+        second_ids = [ids[link.secondNode] for link in links]
+        self.first[first:last] = first_ids
+        self.second[first:last] = second_ids
+        for slot, link in enumerate(links, first):
+            self.linkSlots[link] = slot
+        self.links.extend(links)
+        pack = recordPacks[AddLinkRecord]
+        self.queue.append(b''.join([pack(AddLinkRecord, first_id, second_id) for first_id, second_id in zip(first_ids, second_ids)]))
+        self.recordCount += len(links)
+
+    #links of node are removed (and journaled) before it
+    def RemoveNode(self, node:Node):
+        id = self.ids.pop(node)
+        self.alive[id] = False
+        self.queue.append(recordPacks[RemoveNodeRecord](RemoveNodeRecord, id))
+        self.recordCount += 1
+
+    #last link is moved to slot of removed one - O(1)
+    def RemoveLink(self, link:Link):
+        slot = self.linkSlots.pop(link)
+        last = len(self.links) - 1
+        if slot != last:
+            moved = self.links[last]
+            self.links[slot] = moved
+            self.linkSlots[moved] = slot
+            self.first[slot] = self.first[last]
+            self.second[slot] = self.second[last]
+        self.links.pop()
+        self.queue.append(recordPacks[RemoveLinkRecord](RemoveLinkRecord, self.ids[link.firstNode], self.ids[link.secondNode]))
+        self.recordCount += 1
+
+    def MoveNode(self, node:Node):
+        id = self.ids[node]
+        self.x[id] = node.pos.x
+        self.y[id] = node.pos.y
+        self.queue.append(recordPacks[MoveNodeRecord](MoveNodeRecord, id, node.pos.x, node.pos.y))
+        self.recordCount += 1
+
+    #body of writer thread - takes queued items every flush interval, journal file is synced once per batch
+    #generation - of journal continued by thread, later ones come with queued snapshots
+    def Run(self, generation:int):
+        file = None
+        try:
+            while True:
+                stopping = self.stopping.wait(self.flushInterval)
+                records = []
+                while self.queue:
+                    item = self.queue.popleft()
+                    if type(item) == bytes:
+                        records.append(item)
+                        continue
+                    #records before snapshot belong to previous journal
+                    if file != None:
+                        self.WriteRecords(file, records)
+                        file.close()
+                    records = []
+                    generation = item[0]
+                    file = self.WriteSnapshot(*item)
+                if file == None:
+                    file = open(GetJournalPath(self.directory, generation), 'ab')
+                self.WriteRecords(file, records)
+                if stopping:
+                    break
+        except OSError as error:
+            self.error = error
+            self.queue.clear()
+        finally:
+            if file != None:
+                file.close()
+
+    @staticmethod
+    def WriteRecords(file, records:list[bytes]):
+        if records:
+            file.write(b''.join(records))
+            file.flush()
+            os.fsync(file.fileno())
+
+    #snapshot becomes visible (renamed) only when it and its ids are complete, files of older generations are removed after that
+    #columns - copies of journal columns, nodes by id, links by slot; returns new empty journal
+    def WriteSnapshot(self, generation:int, width:int, height:int, columns:dict):
+        ids = np.flatnonzero(columns['alive'])
+        file_columns = {name : columns[name][ids] for name in ('x', 'y', 'width', 'height', 'color')}
+        #links refer to nodes by index in file
+        file_columns['first'] = np.searchsorted(ids, columns['first'])
+        file_columns['second'] = np.searchsorted(ids, columns['second'])
+
+        ids_path = GetIdsPath(self.directory, generation)
+        with open(ids_path + '.tmp', 'wb') as file:
+            file.write(ids.astype(np.uint32).tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(ids_path + '.tmp', ids_path)
+        path = GetSnapshotPath(self.directory, generation)
+        temp_path = path + '.tmp'
+        GraphFile.WriteColumns(temp_path, width, height, file_columns)
+        with open(temp_path, 'rb+') as file:
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+        file = open(GetJournalPath(self.directory, generation), 'wb')
+        file.write(header.pack(magic, version))
+        file.flush()
+        os.fsync(file.fileno())
+        for old in GetGenerations(self.directory, 'snapshot_') + GetGenerations(self.directory, 'journal_'):
+            if old < generation:
+                for old_path in (GetSnapshotPath(self.directory, old), GetIdsPath(self.directory, old), GetJournalPath(self.directory, old)):
+                    if os.path.exists(old_path):
+                        os.remove(old_path)
+        return file
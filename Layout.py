@@ -0,0 +1,313 @@
+#force-directed auto-layout (Fruchterman-Reingold forces, Barnes-Hut approximation of repulsion)
+#all maths is done on numpy arrays, layout runs in worker process and ui takes latest positions when it wants
+#numpy is optional - without it layout is not available
+import multiprocessing
+import time
+from Utils import *
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+available = np is not None
+
+#for cell at position (px, py) inside its parent - offsets of 27 cells which are children of parent's neighbours
+#but not neighbours of the cell itself (see ForceLayout.AddFarRepulsion)
+def GetFarOffsets(px:int, py:int):
+    offsets = [(dx - px, dy - py) for dx in range(-2, 4) for dy in range(-2, 4) if abs(dx - px) > 1 or abs(dy - py) > 1]
+    return [offset[0] for offset in offsets], [offset[1] for offset in offsets]
+
+if available:
+    #rows are indexed by px * 2 + py
+    farOffsetsX = np.array([GetFarOffsets(px, py)[0] for px in (0, 1) for py in (0, 1)])
+    farOffsetsY = np.array([GetFarOffsets(px, py)[1] for px in (0, 1) for py in (0, 1)])
+
+
+#layout of nodes given by centers, sizes and links (pairs of node indices) inside area (0, 0, width, height)
+class ForceLayout:
+    #ideal link length in units of node size
+    linkLength = 3
+    #iterations after which nodes stop moving
+    iterations = 80
+    #finest quadtree level has about this many nodes per cell
+    nodesPerCell = 2
+    #pull towards center of graph - keeps unconnected parts together
+    gravity = 0.05
+    #free pixels kept between nodes (touching nodes are overlapping, see Node.IsIntersectingOther)
+    gap = 2
+
+    def __init__(self, xs, ys, widths, heights, sources, targets, width:int, height:int):
+        self.x = np.asarray(xs, np.float64)
+        self.y = np.asarray(ys, np.float64)
+        self.width = np.asarray(widths, np.float64)
+        self.height = np.asarray(heights, np.float64)
+        self.sources = np.asarray(sources, np.int64)
+        self.targets = np.asarray(targets, np.int64)
+        self.areaWidth = width
+        self.areaHeight = height
+
+        count = len(self.x)
+        self.k = self.linkLength * float(max(self.width.max(), self.height.max())) if count else 1
+        #maximum move per iteration, cools down to zero
+        self.startTemperature = self.k * 3
+        self.iteration = 0
+        #quadtree depth - levels from 2 to depth are used (on levels 0 and 1 every cell is a neighbour)
+        self.depth = 2
+        while 4 ** self.depth * self.nodesPerCell < count and self.depth < 9:
+            self.depth += 1
+
+    def IsFinished(self):
+        return self.iteration >= self.iterations
+
+    #cell coordinates of every node on quadtree level (2^level cells per side of square covering all nodes)
+    def GetCells(self, level:int, left:float, top:float, size:float):
+        cells = 2 ** level
+        cx = np.clip(((self.x - left) * (cells / size)).astype(np.int64), 0, cells - 1)
+        cy = np.clip(((self.y - top) * (cells / size)).astype(np.int64), 0, cells - 1)
+        return cx, cy
+
+    #repulsion from far nodes - approximated by centers of mass of quadtree cells
+    #on every level node interacts with cells which are children of parent's neighbours but not neighbours of its own cell
+    #(cells closer than that were handled on finer level, cells further - on coarser one)
+    #on coarser levels force is computed once per cell (at its center of mass) and shared by its nodes
+    def AddFarRepulsion(self, fx, fy, left:float, top:float, size:float):
+        for level in range(2, self.depth + 1):
+            cells = 2 ** level
+            cx, cy = self.GetCells(level, left, top, size)
+            ids = cx * cells + cy
+            mass = np.bincount(ids, minlength=cells * cells).astype(np.float64)
+            #empty cells have no mass, their center doesn't matter
+            divisor = np.maximum(mass, 1)
+            mass_x = np.bincount(ids, self.x, cells * cells) / divisor
+            mass_y = np.bincount(ids, self.y, cells * cells) / divisor
+            if level == self.depth:
+                level_fx, level_fy = self.GetCellForces(self.x, self.y, cx, cy, cells, mass, mass_x, mass_y)
+                fx += level_fx
+                fy += level_fy
+            else:
+                occupied = np.flatnonzero(mass)
+                cell_fx, cell_fy = self.GetCellForces(mass_x[occupied], mass_y[occupied], occupied // cells, occupied % cells, cells, mass, mass_x, mass_y)
+                #cell id -> index in occupied cells
+                index = np.zeros(cells * cells, np.int64)
+                index[occupied] = np.arange(len(occupied))
+                fx += cell_fx[index[ids]]
+                fy += cell_fy[index[ids]]
+
+    #repulsion of points (x, y) in cells (cx, cy) from well separated cells of the same level
+    def GetCellForces(self, x, y, cx, cy, cells:int, mass, mass_x, mass_y):
+        #offsets of interacting cells depend only on position of cell inside its parent
+        parity = (cx % 2) * 2 + cy % 2
+        tx = cx[:, None] + farOffsetsX[parity]
+        ty = cy[:, None] + farOffsetsY[parity]
+        inside = (tx >= 0) & (tx < cells) & (ty >= 0) & (ty < cells)
+        other = np.where(inside, tx * cells + ty, 0)
+        dx = x[:, None] - mass_x[other]
+        dy = y[:, None] - mass_y[other]
+        factor = (self.k * self.k) * np.where(inside, mass[other], 0) / np.maximum(dx * dx + dy * dy, 1)
+        return (factor * dx).sum(axis=1), (factor * dy).sum(axis=1)
+
+    #pairs (i, j), i != j, of nodes in same or neighbouring cells of grid with given cell size
+    def GetNearPairs(self, left:float, top:float, cellSize:float):
+        cx = ((self.x - left) // cellSize).astype(np.int64)
+        cy = ((self.y - top) // cellSize).astype(np.int64)
+        columns = int(cx.max()) + 1
+        rows = int(cy.max()) + 1
+        ids = cx * rows + cy
+        #nodes sorted by cell, every cell is a slice of order
+        order = np.argsort(ids, kind='stable')
+        cell_counts = np.bincount(ids, minlength=columns * rows)
+        cell_starts = np.cumsum(cell_counts) - cell_counts
+        firsts = []
+        seconds = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nx = cx + dx
+                ny = cy + dy
+                inside = (nx >= 0) & (nx < columns) & (ny >= 0) & (ny < rows)
+                neighbours = np.where(inside, nx * rows + ny, 0)
+                counts = np.where(inside, cell_counts[neighbours], 0)
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                inner = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                firsts.append(np.repeat(np.arange(len(ids)), counts))
+                seconds.append(order[np.repeat(cell_starts[neighbours], counts) + inner])
+        first = np.concatenate(firsts)
+        second = np.concatenate(seconds)
+        different = first != second
+        return first[different], second[different]
+
+    #one iteration, returns largest move
+    def Step(self):
+        count = len(self.x)
+        if count == 0 or self.IsFinished():
+            self.iteration = self.iterations
+            return 0
+        left = float(self.x.min())
+        top = float(self.y.min())
+        size = max(float(self.x.max()) - left, float(self.y.max()) - top, 1) * 1.0001
+        fx = np.zeros(count)
+        fy = np.zeros(count)
+
+        #far nodes through quadtree, near ones (same or neighbouring cell of finest level) exactly
+        self.AddFarRepulsion(fx, fy, left, top, size)
+        first, second = self.GetNearPairs(left, top, size / 2 ** self.depth)
+        dx = self.x[first] - self.x[second]
+        dy = self.y[first] - self.y[second]
+        factor = self.k * self.k / np.maximum(dx * dx + dy * dy, 1)
+        fx += np.bincount(first, factor * dx, count)
+        fy += np.bincount(first, factor * dy, count)
+
+        #links pull their nodes together
+        if len(self.sources):
+            dx = self.x[self.sources] - self.x[self.targets]
+            dy = self.y[self.sources] - self.y[self.targets]
+            distance = np.sqrt(dx * dx + dy * dy)
+            ax = dx * distance / self.k
+            ay = dy * distance / self.k
+            fx += np.bincount(self.targets, ax, count) - np.bincount(self.sources, ax, count)
+            fy += np.bincount(self.targets, ay, count) - np.bincount(self.sources, ay, count)
+
+        fx += self.gravity * self.k * (self.x.mean() - self.x)
+        fy += self.gravity * self.k * (self.y.mean() - self.y)
+
+        #move is limited by temperature which cools down linearly
+        temperature = self.startTemperature * (1 - self.iteration / self.iterations)
+        length = np.maximum(np.sqrt(fx * fx + fy * fy), 1e-9)
+        scale = np.minimum(length, temperature) / length
+        self.x += fx * scale
+        self.y += fy * scale
+        #overlaps only have to be gone at the end, till then one round per iteration keeps them small
+        if self.iteration == self.iterations - 1:
+            self.RemoveOverlaps(50)
+        else:
+            self.RemoveOverlaps(1 if self.iteration < self.iterations * 0.9 else 5)
+        self.iteration += 1
+        return float((length * scale).max())
+
+    #pushes overlapping nodes apart along axis of smaller overlap and keeps them inside area
+    #stops early when last few rounds didn't reduce number of overlaps (crowded area can't be made free of them)
+    def RemoveOverlaps(self, rounds:int, patience:int = 5):
+        count = len(self.x)
+        #overlapping nodes are always in same or neighbouring cells of this size
+        cell_size = float(max(self.width.max(), self.height.max())) + self.gap
+        fewest = None
+        stalled = 0
+        for i in range(rounds):
+            first, second = self.GetNearPairs(float(self.x.min()), float(self.y.min()), cell_size)
+            dx = self.x[first] - self.x[second]
+            dy = self.y[first] - self.y[second]
+            overlap_x = (self.width[first] + self.width[second]) / 2 + self.gap - np.abs(dx)
+            overlap_y = (self.height[first] + self.height[second]) / 2 + self.gap - np.abs(dy)
+            overlapping = (overlap_x > 0) & (overlap_y > 0)
+            overlaps = int(overlapping.sum())
+            if overlaps == 0:
+                break
+            if fewest == None or overlaps < fewest:
+                fewest = overlaps
+                stalled = 0
+            else:
+                stalled += 1
+                if stalled >= patience:
+                    break
+            #every pair is found from both sides, so each node moves by half of overlap
+            along_x = overlapping & (overlap_x <= overlap_y)
+            along_y = overlapping & (overlap_x > overlap_y)
+            #nodes at the same place are separated by index
+            sign_x = np.where(dx != 0, np.sign(dx), np.where(first < second, -1, 1))
+            sign_y = np.where(dy != 0, np.sign(dy), np.where(first < second, -1, 1))
+            self.x += np.bincount(first, np.where(along_x, sign_x * overlap_x / 2, 0), count)
+            self.y += np.bincount(first, np.where(along_y, sign_y * overlap_y / 2, 0), count)
+            self.x = np.clip(self.x, self.width / 2, self.areaWidth - self.width / 2)
+            self.y = np.clip(self.y, self.height / 2, self.areaHeight - self.height / 2)
+
+    def Run(self):
+        while not self.IsFinished():
+            self.Step()
+
+    #top-left corners of nodes
+    def GetPositions(self):
+        return (self.x - self.width / 2).astype(np.int64), (self.y - self.height / 2).astype(np.int64)
+
+#runs layout in separate process and publishes positions after every iteration into shared memory
+#ui takes latest positions whenever it wants (e.g. on timer) - process doesn't compete with ui for GIL
+class LayoutWorker:
+    #seconds Stop waits for process to finish its iteration before terminating it
+    stopTimeout = 0.1
+
+    def __init__(self, layout:ForceLayout):
+        context = multiprocessing.get_context('spawn')
+        count = len(layout.x)
+        self.xs = context.Array('q', count, lock=False)
+        self.ys = context.Array('q', count, lock=False)
+        #incremented when new positions are published, its lock guards positions too
+        self.version = context.Value('q', 0)
+        self.takenVersion = 0
+        self.stopped = context.Event()
+        self.process = context.Process(target=RunLayout, args=(layout, self.xs, self.ys, self.version, self.stopped), daemon=True)
+
+    def Start(self):
+        self.process.start()
+
+    def Stop(self):
+        self.stopped.set()
+        self.process.join(self.stopTimeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+    def IsRunning(self):
+        return self.process.is_alive()
+
+    #latest positions or None if nothing new was published since last call
+    def TakePositions(self):
+        with self.version.get_lock():
+            if self.version.value == self.takenVersion:
+                return None
+            self.takenVersion = self.version.value
+            return np.array(self.xs, np.int64), np.array(self.ys, np.int64)
+
+#body of layout process
+def RunLayout(layout:ForceLayout, xs, ys, version, stopped):
+    shared_xs = np.frombuffer(xs, np.int64)
+    shared_ys = np.frombuffer(ys, np.int64)
+    while not stopped.is_set() and not layout.IsFinished():
+        layout.Step()
+        new_xs, new_ys = layout.GetPositions()
+        with version.get_lock():
+            shared_xs[:] = new_xs
+            shared_ys[:] = new_ys
+            version.value += 1
+
+#layout of all graph nodes, returns nodes (in order used by layout) and layout
+def CreateLayout(graph):
+    nodes = list(graph.nodes)
+    indices = {node : index for index, node in enumerate(nodes)}
+    layout = ForceLayout([node.pos.x + node.width / 2 for node in nodes],
+                         [node.pos.y + node.height / 2 for node in nodes],
+                         [node.width for node in nodes],
+                         [node.height for node in nodes],
+                         [indices[link.firstNode] for link in graph.links],
+                         [indices[link.secondNode] for link in graph.links],
+                         graph.width, graph.height)
+    return nodes, layout
+
+#moves nodes to given top-left corners starting from node with index first, node stays where it is if its new place is not valid
+#(graph could change while layout was running - removed nodes and dragged node are skipped)
+#timeLimit (seconds) - stop after it to keep ui responsive, next call continues from returned index
+#returns number of moved nodes and index of first node not processed yet
+def ApplyPositions(graph, nodes:list, xs, ys, first:int = 0, timeLimit:float = None):
+    deadline = None if timeLimit == None else time.perf_counter() + timeLimit
+    moved = 0
+    index = first
+    while index < len(nodes):
+        node = nodes[index]
+        x = int(xs[index])
+        y = int(ys[index])
+        if (x != node.pos.x or y != node.pos.y) and node in graph.nodes and node != graph.movingNode:
+            moved += graph.MoveNode(node, Vector2d(x, y))
+        index += 1
+        #checking time is not free, so it is done every 64 nodes
+        if deadline != None and index % 64 == 0 and time.perf_counter() > deadline:
+            break
+    return moved, index
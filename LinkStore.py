@@ -0,0 +1,134 @@
+#struct-of-arrays storage of link segments - used for vectorized hit-testing of many links at once
+#links are handles into the store (slot per link), graph keeps store in sync on add, remove and node move
+#numpy is optional - without it graph tests links one by one (see Link.IsIntersectingPoint)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class LinkStore:
+    available = np is not None
+    #fewer candidates than this are cheaper to test one by one than to gather into arrays
+    minBatch = 4
+
+    def __init__(self, capacity:int = 1024):
+        self.count = 0
+
+        #segment ends (centers of nodes), only first self.count items are valid
+        self.x0 = np.zeros(capacity, np.float64)
+        self.y0 = np.zeros(capacity, np.float64)
+        self.x1 = np.zeros(capacity, np.float64)
+        self.y1 = np.zeros(capacity, np.float64)
+        #render order of link, smaller is on top
+        self.sequence = np.zeros(capacity, np.int64)
+
+        #slot -> link and link -> slot
+        self.links : list = []
+        self.slots : dict = {}
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, link):
+        return link in self.slots
+
+    def Grow(self):
+        capacity = len(self.x0) * 2
+        for name in ('x0', 'y0', 'x1', 'y1', 'sequence'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    #adds many finished links at once, sequences - render order of every link
+    def AddMany(self, links:list, sequences):
+        first = self.count
+        last = first + len(links)
+        while last > len(self.x0):
+            self.Grow()
+        starts = [link.GetStartPoint() for link in links]
+        ends = [link.GetEndPoint() for link in links]
+        self.x0[first:last] = [point.x for point in starts]
+        self.y0[first:last] = [point.y for point in starts]
+        self.x1[first:last] = [point.x for point in ends]
+        self.y1[first:last] = [point.y for point in ends]
+        self.sequence[first:last] = sequences
+        for slot, link in enumerate(links, first):
+            self.slots[link] = slot
+        self.links.extend(links)
+        self.count = last
+
+    #removes link moving last link to its slot - O(1)
+    def Remove(self, link):
+        slot = self.slots.pop(link)
+        last = self.count - 1
+        if slot != last:
+            for array in (self.x0, self.y0, self.x1, self.y1, self.sequence):
+                array[slot] = array[last]
+            moved = self.links[last]
+            self.links[slot] = moved
+            self.slots[moved] = slot
+        self.links.pop()
+        self.count -= 1
+
+    #end of link changed (its node moved)
+    def Update(self, link):
+        slot = self.slots[link]
+        start = link.GetStartPoint()
+        end = link.GetEndPoint()
+        self.x0[slot] = start.x
+        self.y0[slot] = start.y
+        self.x1[slot] = end.x
+        self.y1[slot] = end.y
+
+    #distances from points to segments in given slots, one point per slot
+    #same rules as Link.IsIntersectingPoint - distance to closest end when there is no normal to segment
+    def GetDistances(self, slots, xs, ys):
+        x0 = self.x0[slots]
+        y0 = self.y0[slots]
+        dx = self.x1[slots] - x0
+        dy = self.y1[slots] - y0
+        tx = xs - x0
+        ty = ys - y0
+        along = dx * tx + dy * ty
+        length_sq = dx * dx + dy * dy
+        #projection inside segment - distance to line, otherwise to closer end
+        inside = (along >= 0) & (along <= length_sq)
+        length = np.sqrt(length_sq)
+        to_line = np.abs(dx * ty - dy * tx) / np.where(length > 0, length, 1)
+        to_start = np.hypot(tx, ty)
+        to_end = np.hypot(xs - self.x1[slots], ys - self.y1[slots])
+        return np.where(inside & (length > 0), to_line, np.minimum(to_start, to_end))
+
+    #top-most of given links closer than offset to point (None if there is no such link)
+    def GetTopLinkAtPoint(self, links, x:float, y:float, offset:float):
+        slots = np.fromiter((self.slots[link] for link in links), np.int64, len(links))
+        hits = slots[self.GetDistances(slots, x, y) < offset]
+        if len(hits) == 0:
+            return None
+        return self.links[hits[np.argmin(self.sequence[hits])]]
+
+    #top-most link closer than offset to every point (None if there is no such link)
+    #candidates - links to test for every point
+    def GetTopLinksAtPoints(self, xs, ys, candidates:list, offset:float):
+        result = [None] * len(xs)
+        counts = [len(links) for links in candidates]
+        total = sum(counts)
+        if total == 0:
+            return result
+        queries = np.repeat(np.arange(len(xs)), counts)
+        slots = np.fromiter((self.slots[link] for links in candidates for link in links), np.int64, total)
+        hits = self.GetDistances(slots, np.asarray(xs, np.float64)[queries], np.asarray(ys, np.float64)[queries]) < offset
+        queries = queries[hits]
+        slots = slots[hits]
+        if len(queries) == 0:
+            return result
+        #sorting by query, then by render order - first one in every query group is on top
+        order = np.lexsort((self.sequence[slots], queries))
+        queries = queries[order]
+        slots = slots[order]
+        is_first = np.insert(queries[1:] != queries[:-1], 0, True)
+        for query, slot in zip(queries[is_first].tolist(), slots[is_first].tolist()):
+            result[query] = self.links[slot]
+        return result
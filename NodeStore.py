@@ -0,0 +1,168 @@
+#struct-of-arrays storage of node geometry - used for vectorized queries over many nodes at once
+#nodes are handles into the store (slot per node), graph builds store on first bulk query and keeps it in sync on add, move and remove after that
+#numpy is optional - without it graph simply works without the store
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class NodeStore:
+    available = np is not None
+
+    def __init__(self, cellSize:int, capacity:int = 1024):
+        self.cellSize = cellSize
+        self.count = 0
+
+        #contiguous arrays, only first self.count items are valid
+        self.x = np.zeros(capacity, np.int32)
+        self.y = np.zeros(capacity, np.int32)
+        self.width = np.zeros(capacity, np.int32)
+        self.height = np.zeros(capacity, np.int32)
+
+        #slot -> node and node -> slot
+        self.nodes : list = []
+        self.slots : dict = {}
+
+        #slots sorted by grid cell, so every cell is a contiguous slice
+        #rebuilt lazily after any change
+        self.cellKeys = None
+        self.cellOrder = None
+        #largest width or height of stored nodes, kept up to date on add
+        #recomputed lazily (None) only when node with largest size is removed
+        self.largest = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, node):
+        return node in self.slots
+
+    def Grow(self):
+        capacity = len(self.x) * 2
+        for name in ('x', 'y', 'width', 'height'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def Add(self, node, x:int, y:int, width:int, height:int):
+        if self.count == len(self.x):
+            self.Grow()
+        slot = self.count
+        self.x[slot] = x
+        self.y[slot] = y
+        self.width[slot] = width
+        self.height[slot] = height
+        self.nodes.append(node)
+        self.slots[node] = slot
+        self.count += 1
+        self.cellKeys = None
+        if self.largest != None:
+            self.largest = max(self.largest, width, height)
+
+    #adds many nodes at once, width and height are either one value for all of them or sequences
+    def AddMany(self, nodes:list, xs, ys, width:int, height:int):
+        first = self.count
+        last = first + len(nodes)
+        while last > len(self.x):
+            self.Grow()
+        self.x[first:last] = xs
+        self.y[first:last] = ys
+        self.width[first:last] = width
+        self.height[first:last] = height
+        for slot, node in enumerate(nodes, first):
+            self.slots[node] = slot
+        self.nodes.extend(nodes)
+        self.count = last
+        self.cellKeys = None
+        if self.largest != None and last > first:
+            self.largest = max(self.largest, int(self.width[first:last].max()), int(self.height[first:last].max()))
+
+    #removes node moving last node to its slot - O(1)
+    def Remove(self, node):
+        slot = self.slots.pop(node)
+        last = self.count - 1
+        if max(self.width[slot], self.height[slot]) == self.largest:
+            self.largest = None
+        if slot != last:
+            for array in (self.x, self.y, self.width, self.height):
+                array[slot] = array[last]
+            moved = self.nodes[last]
+            self.nodes[slot] = moved
+            self.slots[moved] = slot
+        self.nodes.pop()
+        self.count -= 1
+        self.cellKeys = None
+
+    def Move(self, node, x:int, y:int):
+        slot = self.slots[node]
+        self.x[slot] = x
+        self.y[slot] = y
+        self.cellKeys = None
+
+    def GetCellKeys(self, cellsX, cellsY):
+        #one sortable int64 key per cell (y is shifted to be non-negative)
+        return (cellsX.astype(np.int64) << 32) + (cellsY.astype(np.int64) + (1 << 31))
+
+    def GetCellIndex(self):
+        if self.cellKeys is None:
+            n = self.count
+            keys = self.GetCellKeys(self.x[:n] // self.cellSize, self.y[:n] // self.cellSize)
+            self.cellOrder = np.argsort(keys, kind='stable')
+            self.cellKeys = keys[self.cellOrder]
+        return self.cellKeys, self.cellOrder
+
+    #pairs (query index, slot) of stored nodes in cells up to radius cells away from query cells
+    def GetCandidates(self, cellsX, cellsY, radius:int = 1):
+        keys, order = self.GetCellIndex()
+        queries = np.arange(len(cellsX))
+        query_parts = []
+        slot_parts = []
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                neighbours = self.GetCellKeys(cellsX + dx, cellsY + dy)
+                starts = np.searchsorted(keys, neighbours, 'left')
+                counts = np.searchsorted(keys, neighbours, 'right') - starts
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                #index inside every cell slice
+                inner = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                query_parts.append(np.repeat(queries, counts))
+                slot_parts.append(order[np.repeat(starts, counts) + inner])
+        if not query_parts:
+            empty = np.zeros(0, np.int64)
+            return empty, empty
+        return np.concatenate(query_parts), np.concatenate(slot_parts)
+
+    #neighbour radius needed to find every node which can touch area of given size
+    def GetSearchRadius(self, width:int, height:int):
+        if self.largest == None:
+            n = self.count
+            self.largest = max(int(self.width[:n].max()), int(self.height[:n].max())) if n else 0
+        largest = max(width, height, self.largest)
+        return max(1, -(-largest // self.cellSize))
+
+    #for every rect - whether it intersects (or touches) any stored node, except excluded one
+    #same rules as Node.IsIntersectingOther
+    def GetIntersectingMask(self, lefts, tops, width:int, height:int, exclude = None):
+        lefts = np.asarray(lefts, np.int64)
+        tops = np.asarray(tops, np.int64)
+        result = np.zeros(len(lefts), bool)
+        if self.count == 0 or len(lefts) == 0:
+            return result
+        radius = self.GetSearchRadius(width, height)
+        queries, slots = self.GetCandidates(lefts // self.cellSize, tops // self.cellSize, radius)
+        other_left = self.x[slots]
+        other_top = self.y[slots]
+        other_right = other_left + self.width[slots]
+        other_bottom = other_top + self.height[slots]
+        left = lefts[queries]
+        top = tops[queries]
+        separated = (left > other_right) | (left + width < other_left) | (top > other_bottom) | (top + height < other_top)
+        hits = ~separated
+        if exclude is not None and exclude in self.slots:
+            hits &= slots != self.slots[exclude]
+        result[queries[hits]] = True
+        return result
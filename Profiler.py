@@ -0,0 +1,87 @@
+#per-phase timing of frames
+#phases are measured by wrapping functions while profiler is enabled - when it is disabled
+#original functions are put back, so disabled profiler costs nothing
+import csv
+import json
+import time
+from collections import deque
+
+
+class Profiler:
+    def __init__(self, window:int = 600):
+        #rolling window of last samples (in seconds) of every phase
+        self.window = window
+        self.samples : dict[str, deque] = {}
+        #(owner, attribute name) -> original function
+        self.originals : dict[tuple, object] = {}
+        self.enabled = False
+
+    #starts measuring calls of owner.name (owner is class or module), label is phase name
+    def Instrument(self, owner, name:str, label:str = None):
+        key = (owner, name)
+        if key in self.originals:
+            return
+        original = getattr(owner, name)
+        samples = self.samples.setdefault(label or name, deque(maxlen=self.window))
+        def Timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+        Timed.__name__ = getattr(original, '__name__', name)
+        self.originals[key] = original
+        setattr(owner, name, Timed)
+        self.enabled = True
+
+    #adds sample measured outside of instrumented functions (e.g. by session replay)
+    def AddSample(self, label:str, seconds:float):
+        self.samples.setdefault(label, deque(maxlen=self.window)).append(seconds)
+
+    #puts all original functions back
+    def Disable(self):
+        for (owner, name), original in self.originals.items():
+            setattr(owner, name, original)
+        self.originals = {}
+        self.enabled = False
+
+    def Clear(self):
+        for samples in self.samples.values():
+            samples.clear()
+
+    @staticmethod
+    def GetPercentile(ordered:list, percent:float):
+        if not ordered:
+            return 0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    #phase -> count, mean, p50, p95, p99 and max (in milliseconds)
+    def GetSummary(self):
+        summary = {}
+        for phase, samples in self.samples.items():
+            ordered = sorted(samples)
+            summary[phase] = {
+                'count' : len(ordered),
+                'mean' : sum(ordered) * 1000 / len(ordered) if ordered else 0,
+                'p50' : self.GetPercentile(ordered, 50) * 1000,
+                'p95' : self.GetPercentile(ordered, 95) * 1000,
+                'p99' : self.GetPercentile(ordered, 99) * 1000,
+                'max' : ordered[-1] * 1000 if ordered else 0,
+            }
+        return summary
+
+    #summary and raw samples, extra is stored as is (e.g. graph size)
+    def ExportJSON(self, path:str, extra:dict = None):
+        data = {'summary' : self.GetSummary(),
+                'samples_ms' : {phase : [sample * 1000 for sample in samples] for phase, samples in self.samples.items()}}
+        if extra:
+            data.update(extra)
+        with open(path, 'w') as file:
+            json.dump(data, file, indent=1)
+
+    def ExportCSV(self, path:str):
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['phase', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+            for phase, stats in self.GetSummary().items():
+                writer.writerow([phase, stats['count'], stats['mean'], stats['p50'], stats['p95'], stats['p99'], stats['max']])
@@ -0,0 +1,155 @@
+#recording of input sessions and their replay without ui
+#recording keeps initial graph state and every input event (in graph coordinates) with its time, so slow interactive cases
+#(long drags, mass link creation, removal of hubs) can be replayed later as repeatable benchmarks
+#changes not caused by input (auto-layout, loading) are not recorded - application doesn't record while they run
+#  python Recorder.py session.rec [--realtime] [--output report.json]
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from GraphObjects import *
+from Profiler import Profiler
+
+#event kinds
+MouseKind = 'mouse'
+HoverKind = 'hover'
+KeyKind = 'key'
+FillKind = 'fill'
+
+mouseTypeNames = {
+    MouseEvent.Press : 'Press',
+    MouseEvent.Release : 'Release',
+    MouseEvent.Move : 'Move',
+    MouseEvent.DoubleClick : 'DoubleClick',
+}
+
+#snapshot of nodes (top-left corner, color index and size) and links (indices of their nodes)
+def GetGraphState(graph:Graph):
+    indices = {node : index for index, node in enumerate(graph.nodes)}
+    return {'width' : graph.width, 'height' : graph.height,
+            'nodes' : [[node.pos.x, node.pos.y, node.colorIndex, node.width, node.height] for node in graph.nodes],
+            'links' : [[indices[link.firstNode], indices[link.secondNode]] for link in graph.links]}
+
+def CreateGraphFromState(state:dict):
+    graph = Graph(state['width'], state['height'])
+    nodes = []
+    for x, y, color, width, height in state['nodes']:
+        node = Node(graph, width, height, color)
+        node.pos = Vector2d(x, y)
+        nodes.append(node)
+    graph.AddNodes(nodes)
+    #graph.links keeps insertion order, so links are recreated in the same order
+    for first, second in state['links']:
+        link = Link(nodes[first])
+        link.SetSecondNode(nodes[second])
+        graph.AddLink(link)
+    graph.TakeDirtyRects()
+    return graph
+
+class Recorder:
+    def __init__(self):
+        self.recording = False
+        self.events : list[list] = []
+        self.initialState : dict = None
+        self.seed = 0
+        self.startTime = 0
+
+    def Start(self, graph:Graph):
+        self.recording = True
+        self.events = []
+        self.initialState = GetGraphState(graph)
+        #new nodes get random colors - seeding generator of graph makes replay create the same ones
+        self.seed = random.randrange(1 << 31)
+        graph.random = random.Random(self.seed)
+        self.startTime = time.perf_counter()
+
+    #events are stored as [time, kind, arguments...]
+    def Add(self, kind:str, *arguments):
+        if self.recording:
+            self.events.append([round(time.perf_counter() - self.startTime, 6), kind, *arguments])
+
+    def AddMouse(self, event:MouseEvent):
+        self.Add(MouseKind, event.type, event.button, event.x, event.y)
+
+    def AddHover(self, pos:Vector2d):
+        self.Add(HoverKind, pos.x, pos.y)
+
+    def AddKey(self, text:str):
+        self.Add(KeyKind, text)
+
+    #region (x, y, width, height) filled with nodes
+    def AddFill(self, rect:tuple[int, int, int, int]):
+        self.Add(FillKind, *rect)
+
+    #stops recording and saves session, final graph size is kept to check replay
+    def Stop(self, graph:Graph, path:str):
+        self.recording = False
+        session = {'version' : 1, 'seed' : self.seed, 'initial' : self.initialState, 'events' : self.events,
+                   'final' : {'nodes' : len(graph.nodes), 'links' : len(graph.links)}}
+        with gzip.open(path, 'wt') as file:
+            json.dump(session, file, separators=(',', ':'))
+
+def LoadSession(path:str):
+    with gzip.open(path, 'rt') as file:
+        return json.load(file)
+
+#feeds recorded events to graph the same way application does
+#realtime - keep recorded pauses between events, otherwise events are processed as fast as possible
+#returns report with per-event latency percentiles (milliseconds) by event kind
+def Replay(session:dict, realtime = False):
+    graph = CreateGraphFromState(session['initial'])
+    graph.random = random.Random(session['seed'])
+    profiler = Profiler(window=None)
+    start = time.perf_counter()
+    for event in session['events']:
+        timestamp, kind, arguments = event[0], event[1], event[2:]
+        if realtime:
+            delay = start + timestamp - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        event_start = time.perf_counter()
+        if kind == MouseKind:
+            label = mouseTypeNames[arguments[0]]
+            graph.ProcessInput(MouseEvent(*arguments))
+        elif kind == HoverKind:
+            label = 'Hover'
+            graph.GetObjectUnderMouse(Vector2f(*arguments))
+        elif kind == KeyKind:
+            #keys changing graph are recorded as separate events (e.g. fill)
+            label = 'Key ' + arguments[0]
+        elif kind == FillKind:
+            label = 'Fill'
+            graph.FillRegion(arguments)
+        #application repaints after every frame, dirty areas are taken by it
+        graph.TakeDirtyRects()
+        end = time.perf_counter()
+        profiler.AddSample(label, end - event_start)
+        if realtime:
+            #how late event was handled compared to when it happened
+            profiler.AddSample('Lag', end - start - timestamp)
+    final = {'nodes' : len(graph.nodes), 'links' : len(graph.links)}
+    return {'events' : len(session['events']), 'realtime' : realtime,
+            'duration_ms' : (time.perf_counter() - start) * 1000,
+            'recorded_duration_ms' : session['events'][-1][0] * 1000 if session['events'] else 0,
+            'final' : final, 'matches_recording' : final == session['final'],
+            'latency' : profiler.GetSummary()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays recorded input session without ui')
+    parser.add_argument('session', help='file recorded by application (r key)')
+    parser.add_argument('--realtime', action='store_true', help='keep recorded pauses between events')
+    parser.add_argument('--output', help='file for JSON report (stdout by default)')
+    args = parser.parse_args()
+
+    report = Replay(LoadSession(args.session), args.realtime)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#multi-level spatial hash of rectangular objects (anything with pos, width and height)
+#level L has cells of size cellSize * 2^L, object is stored in the cell of its top-left corner at a level
+#where it fits in one cell - so at every level it can only reach cells one step to the right and down
+#big objects go to coarser levels, crowded cells are split - their objects move to finer levels
+from Utils import *
+
+
+class SpatialHash:
+    #cell with more objects than this is split
+    maxCellObjects = 16
+    #finest level (cells of cellSize / 8)
+    minLevel = -3
+
+    def __init__(self, cellSize:int):
+        self.cellSize = cellSize
+        #level -> cell -> objects
+        self.levels : dict[int, dict[tuple[int, int], set]] = {}
+        #object -> (level, cell) where it is stored, makes remove and move O(1)
+        self.locations : dict[object, tuple[int, tuple[int, int]]] = {}
+        #(level, cell) of split cells - objects fitting finer cells are stored one level down
+        self.splitCells : set[tuple[int, tuple[int, int]]] = set()
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __contains__(self, object):
+        return object in self.locations
+
+    def GetCellSize(self, level:int):
+        return self.cellSize * 2.0 ** level
+
+    def GetCell(self, level:int, x, y):
+        size = self.GetCellSize(level)
+        return (int(x // size), int(y // size))
+
+    #coarsest level needed for object, but not finer than base one
+    def GetFitLevel(self, object):
+        size = max(object.width, object.height)
+        level = 0
+        while size > self.GetCellSize(level):
+            level += 1
+        return level
+
+    #where object has to be stored for its current position and size
+    def GetLocation(self, object):
+        level = self.GetFitLevel(object)
+        size = max(object.width, object.height)
+        location = (level, self.GetCell(level, object.pos.x, object.pos.y))
+        while location in self.splitCells and level > self.minLevel and size <= self.GetCellSize(level - 1):
+            level -= 1
+            location = (level, self.GetCell(level, object.pos.x, object.pos.y))
+        return location
+
+    def Insert(self, object):
+        self.Store(object, self.GetLocation(object))
+
+    def Store(self, object, location:tuple[int, tuple[int, int]]):
+        level, cell = location
+        cells = self.levels.setdefault(level, {})
+        if not cell in cells:
+            cells[cell] = set()
+        cells[cell].add(object)
+        self.locations[object] = location
+        if len(cells[cell]) > self.maxCellObjects:
+            self.Split(location)
+
+    def Remove(self, object):
+        level, cell = self.locations.pop(object)
+        cells = self.levels[level]
+        cells[cell].discard(object)
+        if len(cells[cell]) == 0:
+            cells.pop(cell)
+            if len(cells) == 0:
+                self.levels.pop(level)
+
+    #updates object after its position changed, nothing is done while it stays in the same cell
+    def Move(self, object):
+        location = self.GetLocation(object)
+        if location != self.locations[object]:
+            self.Remove(object)
+            self.Store(object, location)
+
+    #moves objects of crowded cell one level down (if they fit there)
+    def Split(self, location:tuple[int, tuple[int, int]]):
+        level, cell = location
+        if location in self.splitCells or level <= self.minLevel:
+            return
+        self.splitCells.add(location)
+        for object in list(self.levels[level][cell]):
+            new_location = self.GetLocation(object)
+            if new_location != location:
+                self.Remove(object)
+                self.Store(object, new_location)
+
+    #objects which may intersect or touch rect (x, y, width, height) - caller checks exact rules
+    def GetCandidates(self, rect:tuple[int, int, int, int]):
+        for level, cells in self.levels.items():
+            size = self.GetCellSize(level)
+            #objects are stored by top-left corner and not bigger than cell, one more pixel for touching
+            first = self.GetCell(level, rect[0] - size - 1, rect[1] - size - 1)
+            last = self.GetCell(level, rect[0] + rect[2] + 1, rect[1] + rect[3] + 1)
+            for cell, objects in GetGridCells(cells, first, last):
+                yield from objects
+
+    #objects intersecting or touching rect
+    def GetInRect(self, rect:tuple[int, int, int, int]):
+        right = rect[0] + rect[2]
+        bottom = rect[1] + rect[3]
+        return [object for object in self.GetCandidates(rect)
+                if object.pos.x <= right and rect[0] <= object.pos.x + object.width and object.pos.y <= bottom and rect[1] <= object.pos.y + object.height]
+
+    #object closest to point (distance to its rect, 0 inside) or None if there is none within maxDistance
+    #search square grows twice until it finds something - cost depends on local density, not on number of objects
+    def GetNearest(self, x, y, maxDistance:float = None, filter = None):
+        radius = self.cellSize
+        while True:
+            best = None
+            best_distance = None
+            seen = 0
+            for object in self.GetCandidates((x - radius, y - radius, radius * 2, radius * 2)):
+                seen += 1
+                if filter != None and not filter(object):
+                    continue
+                dx = max(object.pos.x - x, 0, x - object.pos.x - object.width)
+                dy = max(object.pos.y - y, 0, y - object.pos.y - object.height)
+                distance = (dx * dx + dy * dy) ** 0.5
+                if best_distance == None or distance < best_distance:
+                    best = object
+                    best_distance = distance
+            #anything closer than radius is surely inside the square
+            found = best_distance != None and best_distance <= radius
+            if found or seen == len(self) or (maxDistance != None and radius >= maxDistance):
+                if best_distance == None or (maxDistance != None and best_distance > maxDistance):
+                    return None
+                return best
+            radius *= 2
+
+    #number of objects per cell of given size in rect (None - everywhere), pairs of cell and count
+    def GetCellCounts(self, size:int, rect:tuple[int, int, int, int] = None):
+        counts : dict[tuple[int, int], int] = {}
+        for level, cells in self.levels.items():
+            level_size = self.GetCellSize(level)
+            if rect == None:
+                items = cells.items()
+            else:
+                first = self.GetCell(level, rect[0] - level_size, rect[1] - level_size)
+                last = self.GetCell(level, rect[0] + rect[2], rect[1] + rect[3])
+                items = GetGridCells(cells, first, last)
+            for (i, j), objects in items:
+                cell = (int(i * level_size // size), int(j * level_size // size))
+                counts[cell] = counts.get(cell, 0) + len(objects)
+        return list(counts.items())
@@ -0,0 +1,145 @@
+#compressed sparse row (CSR) snapshot of graph topology and traversal queries over it
+#neighbours of node i are targets[offsets[i]:offsets[i + 1]], every link is stored in both directions
+#snapshot is built by Graph.GetTopology on demand and cached until links or nodes are added or removed
+#numpy is optional - without it queries are not available
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Topology:
+    available = np is not None
+
+    #nodes and links - containers in their order (index in them is id of object in snapshot)
+    def __init__(self, nodes, links):
+        self.nodes = list(nodes)
+        self.links = list(links)
+        self.indices = {node : index for index, node in enumerate(self.nodes)}
+
+        count = len(self.nodes)
+        #node indices of both ends of every link
+        self.first = np.fromiter((self.indices[link.firstNode] for link in self.links), np.int64, len(self.links))
+        self.second = np.fromiter((self.indices[link.secondNode] for link in self.links), np.int64, len(self.links))
+        first, second = self.first, self.second
+        link_ids = np.arange(len(self.links), dtype=np.int64)
+        sources = np.concatenate((first, second))
+        #sorting by source makes neighbours of every node a contiguous slice
+        order = np.argsort(sources, kind='stable')
+        self.sources = sources[order]
+        self.targets = np.concatenate((second, first))[order]
+        #link of every stored direction, used to highlight links of found paths
+        self.linkIds = np.concatenate((link_ids, link_ids))[order]
+        self.offsets = np.zeros(count + 1, np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=count), out=self.offsets[1:])
+        #computed on first request, snapshot never changes
+        self.components = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def GetDegrees(self):
+        return np.diff(self.offsets)
+
+    #neighbours of all frontier nodes at once (with repeats), and links leading to them
+    def GetNeighbours(self, frontier):
+        starts = self.offsets[frontier]
+        counts = self.offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        #positions of all neighbours: every start repeated count times plus position inside its slice
+        first_positions = np.cumsum(counts) - counts
+        positions = np.repeat(starts - first_positions, counts) + np.arange(total)
+        return self.targets[positions], self.linkIds[positions]
+
+    #breadth-first search from source index, frontier by frontier
+    #returns hop distance of every node (-1 for unreachable) and link through which node was reached first (-1 for none)
+    #maxDepth - stop after that many hops (None - whole component)
+    def Bfs(self, source:int, maxDepth:int = None, target:int = None):
+        distances = np.full(len(self.nodes), -1, np.int64)
+        via = np.full(len(self.nodes), -1, np.int64)
+        distances[source] = 0
+        frontier = np.array([source], np.int64)
+        depth = 0
+        while len(frontier) and (maxDepth == None or depth < maxDepth) and (target == None or distances[target] < 0):
+            depth += 1
+            neighbours, link_ids = self.GetNeighbours(frontier)
+            new = distances[neighbours] < 0
+            neighbours = neighbours[new]
+            link_ids = link_ids[new]
+            #node can be reached from several frontier nodes - first one wins
+            neighbours, first = np.unique(neighbours, return_index=True)
+            distances[neighbours] = depth
+            via[neighbours] = link_ids[first]
+            frontier = neighbours
+        return distances, via
+
+    #indices of nodes and links on shortest (by number of hops) path, None if nodes are not connected
+    def GetShortestPath(self, source:int, target:int):
+        distances, via = self.Bfs(source, target=target)
+        if distances[target] < 0:
+            return None
+        nodes = [target]
+        links = []
+        node = target
+        while node != source:
+            link = int(via[node])
+            links.append(link)
+            #the other end of link is one hop closer to source
+            node = int(self.second[link]) if self.first[link] == node else int(self.first[link])
+            nodes.append(node)
+        nodes.reverse()
+        links.reverse()
+        return nodes, links
+
+    #component label of every node - the smallest node index in its component
+    #roots of linked components are hooked to the smaller one, then pointers are jumped until every node points to its root
+    #number of rounds grows with log of component size, not with its diameter
+    def GetComponents(self):
+        if self.components is None:
+            self.components = self.FindComponents()
+        return self.components
+
+    def FindComponents(self):
+        parents = np.arange(len(self.nodes), dtype=np.int64)
+        first = self.sources
+        second = self.targets
+        while True:
+            first_roots = parents[first]
+            second_roots = parents[second]
+            different = first_roots != second_roots
+            if not different.any():
+                return parents
+            #only links between different components matter in next rounds
+            first = first[different]
+            second = second[different]
+            low = np.minimum(first_roots[different], second_roots[different])
+            high = np.maximum(first_roots[different], second_roots[different])
+            np.minimum.at(parents, high, low)
+            while True:
+                grand_parents = parents[parents]
+                if (grand_parents == parents).all():
+                    break
+                parents = grand_parents
+
+    #indices of nodes in the same component as node and of links between them
+    def GetComponent(self, node:int):
+        labels = self.GetComponents()
+        nodes = np.flatnonzero(labels == labels[node])
+        return nodes, self.GetLinksBetween(nodes)
+
+    #indices of links with both ends among given nodes
+    def GetLinksBetween(self, nodes):
+        inside = np.zeros(len(self.nodes), bool)
+        inside[nodes] = True
+        return np.flatnonzero(inside[self.first] & inside[self.second])
+
+    def GetDegreeStats(self):
+        degrees = self.GetDegrees()
+        if len(degrees) == 0:
+            return {'nodes' : 0, 'links' : 0, 'min' : 0, 'max' : 0, 'mean' : 0.0, 'median' : 0.0, 'isolated' : 0}
+        return {'nodes' : len(degrees), 'links' : len(self.links),
+                'min' : int(degrees.min()), 'max' : int(degrees.max()),
+                'mean' : float(degrees.mean()), 'median' : float(np.median(degrees)),
+                'isolated' : int((degrees == 0).sum())}
@@ -1,17 +1,55 @@
-from PyQt5.QtGui import QFont, QColor, QColorConstants, QPainter
-from PyQt5.QtWidgets import QMessageBox
-from PyQt5.QtCore import QRect, Qt
+#helpers without ui toolkit dependencies (Qt helpers are in GraphQt)
 
 
 def ClampInt(n :int, min_n:int = 0, max_n:int = 1):
     return (max(min_n, min(max_n , n)))
 
+#rects are plain (x, y, width, height) tuples - cheap to create and not bound to Qt
+def GetPointsBounds(points, margin = 0):
+    xs = [point.x for point in points]
+    ys = [point.y for point in points]
+    left = min(xs) - margin
+    top = min(ys) - margin
+    return (left, top, max(xs) + margin - left + 1, max(ys) + margin - top + 1)
+
+def IsRectsIntersecting(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+def UniteRects(a, b):
+    left = min(a[0], b[0])
+    top = min(a[1], b[1])
+    right = max(a[0] + a[2], b[0] + b[2])
+    bottom = max(a[1] + a[3], b[1] + b[3])
+    return (left, top, right - left, bottom - top)
+
+#non-empty cells of grid (dict cell -> objects) with indices from first to last cell
+#walks either the cell range or the whole grid, whichever is smaller - cost depends on the range, not on grid size
+def GetGridCells(grid:dict, first:tuple[int, int], last:tuple[int, int]):
+    if (last[0] - first[0] + 1) * (last[1] - first[1] + 1) > len(grid):
+        for cell, objects in grid.items():
+            if first[0] <= cell[0] <= last[0] and first[1] <= cell[1] <= last[1]:
+                yield cell, objects
+    else:
+        for i in range(first[0], last[0] + 1):
+            for j in range(first[1], last[1] + 1):
+                objects = grid.get((i, j))
+                if objects:
+                    yield (i, j), objects
+
 #The simplest vector - i don't need anything else so didn't use anymore complex ones
+#slots instead of per-instance dict - there is one for every node, millions of them in big graphs
 class Vector2d:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x = 0, y = 0):
         self.x = int(x)
         self.y = int(y)
 
+    #changes vector in place - hot paths reuse vectors instead of creating new ones
+    def Set(self, x, y):
+        self.x = int(x)
+        self.y = int(y)
+
     def __add__(self, other):
         return Vector2d(self.x + other.x, self.y + other.y)
 
@@ -21,55 +59,21 @@ class Vector2d:
     def Clone(self):
         return Vector2d(self.x, self.y)
 
+#point between pixels - world position under mouse at any zoom (see Viewport.ToWorld)
+#it is rounded to Vector2d only where it becomes position of node
+class Vector2f:
+    __slots__ = ('x', 'y')
 
-#Creates Qt error message on error)
-def CreateWarningMessage(warning_message, details = ''):
-    msg = QMessageBox()
-    msg.setFont(QFont("Arial", 10))
-    msg.setIcon(QMessageBox.Critical)
-    msg.setWindowTitle("Error!")
-    msg.setText(warning_message)
-    msg.setInformativeText(details)
-    msg.setStandardButtons(QMessageBox.Ok)
-    msg.exec()
-
-#draws text on screen
-def DrawText(text: str, painter: QPainter, rect: QRect, flags, size = 8, color = QColorConstants.Black, ):
-    painter.save()
-    font = painter.font()
-    font.setPointSize(size)
-    painter.setFont(font)
-    painter.setPen(color)
-
-    painter.drawText(rect, flags, text)
-    painter.restore()
+    def __init__(self, x = 0.0, y = 0.0):
+        self.x = float(x)
+        self.y = float(y)
 
-#draws text in nice predefined semi-transparent frame
-#didn't do any style settings here for time economy, just predefined style =)
-def DrawTextFrame(message:str, mouse_pos:Vector2d, painter:QPainter = None):
-    painter.save()
-    width = 200
-    height = 50
-
-    #some offset to avoid intersection with mouse pointer
-    hint_offset = Vector2d(10, 10)
-    hint_pos = mouse_pos + hint_offset
-
-
-    text_margin = Vector2d(5, 0)
-    text_pos = hint_pos + text_margin
-
-    hint_rect:QRect = QRect(hint_pos.x, hint_pos.y, width, height)
-    text_rect:QRect = QRect(text_pos.x, text_pos.y, width - text_margin.x, height - text_margin.y)
-    r = 200
-    g = 200
-    b = 200
-    color =  QColor.fromRgbF(r/255, g / 255, b / 255, 0.5)
-    painter.setBrush(color)
-    painter.setPen(QColorConstants.Black)
-
-    painter.drawRect(hint_rect)
-    
-    DrawText(message, painter, text_rect, Qt.AlignLeft | Qt.AlignVCenter)
-    painter.restore()
+#text frame settings (frame itself is drawn by GraphQt.DrawTextFrame)
+text_frame_width = 200
+text_frame_height = 50
+#some offset to avoid intersection with mouse pointer
+text_frame_offset = 10
 
+#area covered by text frame drawn near mouse (including pen)
+def GetTextFrameBounds(mouse_pos:Vector2d):
+    return (mouse_pos.x + text_frame_offset, mouse_pos.y + text_frame_offset, text_frame_width + 1, text_frame_height + 1)
@@ -0,0 +1,61 @@
+#mapping between world (graph) coordinates and screen (window) coordinates - pan and zoom
+#screen = (world - offset) * zoom
+from Utils import *
+
+
+class Viewport:
+    minZoom = 0.05
+    maxZoom = 4
+
+    def __init__(self, width:int = 0, height:int = 0):
+        #screen size
+        self.width = width
+        self.height = height
+        #world point shown in top-left corner of screen
+        self.offsetX = 0.0
+        self.offsetY = 0.0
+        self.zoom = 1.0
+        #changed on every pan, zoom or resize - used to know when cached render is outdated
+        self.version = 0
+
+    def SetSize(self, width:int, height:int):
+        self.width = width
+        self.height = height
+        self.version += 1
+
+    def ToWorld(self, x:float, y:float):
+        return Vector2f(x / self.zoom + self.offsetX, y / self.zoom + self.offsetY)
+
+    def ToScreen(self, x:float, y:float):
+        return Vector2f((x - self.offsetX) * self.zoom, (y - self.offsetY) * self.zoom)
+
+    #rects are (x, y, width, height), result is expanded to whole pixels
+    def ToWorldRect(self, rect:tuple[int, int, int, int]):
+        left = int(rect[0] / self.zoom + self.offsetX) - 1
+        top = int(rect[1] / self.zoom + self.offsetY) - 1
+        return (left, top, int(rect[2] / self.zoom) + 3, int(rect[3] / self.zoom) + 3)
+
+    def ToScreenRect(self, rect:tuple[int, int, int, int]):
+        left = int((rect[0] - self.offsetX) * self.zoom) - 1
+        top = int((rect[1] - self.offsetY) * self.zoom) - 1
+        return (left, top, int(rect[2] * self.zoom) + 3, int(rect[3] * self.zoom) + 3)
+
+    #part of world visible on screen
+    def GetVisibleRect(self):
+        return self.ToWorldRect((0, 0, self.width, self.height))
+
+    #moves view by given number of screen pixels
+    def Pan(self, dx:float, dy:float):
+        self.offsetX -= dx / self.zoom
+        self.offsetY -= dy / self.zoom
+        self.version += 1
+
+    #zooms by factor keeping world point under screen point (x, y) in place
+    def ZoomAt(self, factor:float, x:float, y:float):
+        zoom = min(self.maxZoom, max(self.minZoom, self.zoom * factor))
+        if zoom == self.zoom:
+            return
+        self.offsetX += x / self.zoom - x / zoom
+        self.offsetY += y / self.zoom - y / zoom
+        self.zoom = zoom
+        self.version += 1
@@ -0,0 +1,463 @@
+#benchmarks of graph operations on synthetic graphs
+#graph model doesn't need Qt, render benchmark uses Qt offscreen platform, so no window is needed
+#results are printed as JSON (see --help), so runs on different commits can be compared
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from GraphObjects import *
+
+
+#FillWindow as it was before bulk insertion - node by node through CreateNode
+def FillWindowPerNode(graph:Graph):
+    margin_size = Node.defaultWidth//2
+    margin = Vector2d(margin_size, margin_size)
+    cell_size = Vector2d(Node.defaultWidth + margin.x, Node.defaultHeight + margin.y)
+    window_width = graph.width
+    window_height = graph.height
+
+    cell_pos = Vector2d()
+
+    while cell_pos.y<=window_height - Node.defaultHeight:
+        while cell_pos.x <= window_width - Node.defaultWidth:
+            graph.CreateNode(cell_pos + margin, False)
+            cell_pos.x += cell_size.x
+        cell_pos.x = 0
+        cell_pos.y += cell_size.y
+
+#lattice columns for given number of nodes - lattice area is about twice wider than high
+def GetLatticeColumns(node_count:int):
+    return int((node_count * 2) ** 0.5) + 1
+
+#size of area which fits lattice of given number of nodes
+def GetLatticeSize(node_count:int):
+    margin = Node.defaultWidth//2
+    columns = GetLatticeColumns(node_count)
+    rows = node_count // columns + 1
+    return columns * (Node.defaultWidth + margin) + margin, rows * (Node.defaultHeight + margin) + margin
+
+#lattice of nodes with links between nearby nodes
+#link_density - average number of links per node
+def CreateSyntheticGraph(node_count:int, link_density:float, rng:random.Random):
+    width, height = GetLatticeSize(node_count)
+    graph = Graph(width, height)
+    xs, ys = graph.GetLatticePositions((0, 0, width, height))
+    nodes = []
+    for x, y in list(zip(xs, ys))[:node_count]:
+        node = Node(graph)
+        node.pos = Vector2d(x, y)
+        nodes.append(node)
+    graph.AddNodes(nodes)
+
+    #links go to nodes at most few lattice cells away, like in hand-made graphs
+    columns = GetLatticeColumns(node_count)
+    reach = 3
+    link_count = int(node_count * link_density)
+    attempts = 0
+    while len(graph.links) < link_count and attempts < link_count * 3:
+        attempts += 1
+        first = rng.randrange(node_count)
+        column = first % columns + rng.randint(-reach, reach)
+        second = first - first % columns + column + rng.randint(-reach, reach) * columns
+        if second == first or column < 0 or column >= columns or second < 0 or second >= node_count:
+            continue
+        if not graph.IsLinkExists(nodes[first], nodes[second]):
+            link = Link(nodes[first])
+            link.SetSecondNode(nodes[second])
+            graph.AddLink(link)
+    graph.TakeDirtyRects()
+    return graph
+
+def GetRandomPoints(graph:Graph, count:int, rng:random.Random):
+    return [Vector2d(rng.randrange(graph.width), rng.randrange(graph.height)) for i in range(count)]
+
+class Suite:
+    def __init__(self, repeats:int):
+        self.repeats = repeats
+        self.results = []
+
+    #runs operation several times, keeps best time
+    #setup is called before every run and is not timed, its result is passed to operation
+    def Measure(self, name:str, nodes:int, count:int, operation, setup = None, **extra):
+        best = None
+        for i in range(self.repeats):
+            argument = setup() if setup else None
+            start = time.perf_counter()
+            operation(argument)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best == None else min(best, elapsed)
+        result = {'operation' : name, 'nodes' : nodes, 'count' : count,
+                  'total_ms' : best * 1000, 'per_op_us' : best * 1e6 / max(count, 1)}
+        result.update(extra)
+        self.results.append(result)
+        print(f'{name:>20} {nodes:>7} nodes: {best * 1000:9.2f} ms total, {result["per_op_us"]:9.2f} us per op', file=sys.stderr)
+
+    def BenchmarkGraph(self, node_count:int, link_density:float, seed:int):
+        rng = random.Random(seed)
+        graph = CreateSyntheticGraph(node_count, link_density, rng)
+        node_list = list(graph.nodes)
+        links = len(graph.links)
+        self.Measure('build', node_count, node_count, lambda arg: CreateSyntheticGraph(node_count, link_density, random.Random(seed)), links = links)
+
+        self.BenchmarkRender(graph, node_count)
+
+        points = GetRandomPoints(graph, 10000, rng)
+        def Hover(arg):
+            for point in points:
+                graph.GetObjectUnderMouse(point)
+        self.Measure('GetObjectUnderMouse', node_count, len(points), Hover)
+        #frame asks for the same position twice (hover and hint) - second query comes from cache
+        def HoverFrame(arg):
+            for point in points:
+                graph.GetObjectUnderMouse(point)
+                graph.GetObjectUnderMouse(point)
+        self.Measure('hover frame', node_count, len(points), HoverFrame)
+        self.Measure('GetLinksUnderPoints', node_count, len(points), lambda arg: graph.GetLinksUnderPoints(points))
+
+        probe = Node(graph)
+        def Validate(arg):
+            for point in points:
+                probe.pos = point
+                graph.IsValidNodePosition(probe)
+        self.Measure('IsValidNodePosition', node_count, len(points), Validate)
+
+        def RangeQuery(arg):
+            for point in points:
+                graph.GetNodesInRect((point.x, point.y, 100, 100))
+        self.Measure('GetNodesInRect', node_count, len(points), RangeQuery, rect = [100, 100])
+
+        def Nearest(arg):
+            for point in points:
+                graph.GetNearestNode(point)
+        self.Measure('GetNearestNode', node_count, len(points), Nearest)
+
+        pairs = [(rng.choice(node_list), rng.choice(node_list)) for i in range(10000)]
+        for link in list(graph.links)[:5000]:
+            pairs.append((link.secondNode, link.firstNode))
+        def CheckLinks(arg):
+            for first, second in pairs:
+                graph.IsLinkExists(first, second)
+        self.Measure('IsLinkExists', node_count, len(pairs), CheckLinks)
+
+        self.BenchmarkTopology(graph, node_count, rng)
+
+        drag_nodes = rng.sample(node_list, 5)
+        drag_steps = 20
+        def Drag(arg):
+            for node in drag_nodes:
+                center = node.GetCenter().Clone()
+                graph.ProcessInput(MouseEvent(MouseEvent.Press, MouseEvent.LeftButton, center.x, center.y))
+                for step in range(drag_steps):
+                    #wobbling around start so every run does the same work
+                    graph.ProcessInput(MouseEvent(MouseEvent.Move, MouseEvent.NoButton, center.x + step % 5 - 2, center.y + step % 3 - 1))
+                graph.ProcessInput(MouseEvent(MouseEvent.Release, MouseEvent.LeftButton, center.x, center.y))
+            graph.TakeDirtyRects()
+        self.Measure('drag', node_count, len(drag_nodes) * (drag_steps + 2), Drag, events_per_drag = drag_steps + 2)
+
+        def FillSetup():
+            return Graph(graph.width, graph.height)
+        self.Measure('FillWindow', node_count, node_count, lambda empty_graph: empty_graph.FillWindow(), FillSetup)
+
+        #removal changes graph, so it goes last
+        victims = sorted(node_list, key = lambda node: -len(graph.adjacency[node]))[:200]
+        removed_links = sum(len(graph.adjacency[node]) for node in victims)
+        def Remove(arg):
+            for node in victims:
+                if node in graph.nodes:
+                    graph.RemoveNode(node)
+        #can't be repeated - nodes are gone after first run
+        repeats = self.repeats
+        self.repeats = 1
+        self.Measure('RemoveNode', node_count, len(victims), Remove, links_removed = removed_links)
+        self.repeats = repeats
+
+    #traversal queries on topology snapshot (only with numpy)
+    def BenchmarkTopology(self, graph:Graph, node_count:int, rng:random.Random):
+        #snapshot is cached - changing version forces rebuild on every run
+        def Build(arg):
+            graph.topologyVersion += 1
+            graph.GetTopology()
+        if graph.GetTopology() == None:
+            return
+        self.Measure('topology build', node_count, 1, Build, links = len(graph.links))
+        topology = graph.GetTopology()
+        pairs = [(rng.randrange(node_count), rng.randrange(node_count)) for i in range(20)]
+        def Paths(arg):
+            for source, target in pairs:
+                topology.GetShortestPath(source, target)
+        self.Measure('shortest path', node_count, len(pairs), Paths)
+        def Components(arg):
+            topology.components = None
+            topology.GetComponents()
+        self.Measure('components', node_count, 1, Components)
+        self.Measure('degree stats', node_count, 1, lambda arg: topology.GetDegreeStats())
+
+    #many tiny nodes piled in small area among nodes of different sizes - crowded grid cells are split
+    def BenchmarkCluster(self, node_count:int, seed:int):
+        rng = random.Random(seed)
+        graph = Graph(2000, 2000)
+        #tiny nodes on 4x3 lattice around the center, some bigger nodes all over the area
+        columns = int(node_count ** 0.5)
+        nodes = []
+        for index in range(node_count):
+            node = Node(graph, 2, 1)
+            node.pos = Vector2d(900 + index % columns * 4, 900 + index // columns * 3)
+            nodes.append(node)
+        for index in range(200):
+            node = Node(graph, rng.randrange(10, 200), rng.randrange(10, 100))
+            node.pos = Vector2d(rng.randrange(0, 1800), rng.randrange(0, 1800))
+            if graph.AreValidNodePositions([node.pos.x], [node.pos.y])[0] and graph.IsValidNodePosition(node):
+                nodes.append(node)
+                graph.AddNode(node)
+        graph.AddNodes(nodes[:node_count])
+        cluster = columns * 4
+        points = [Vector2d(900 + rng.randrange(cluster), 900 + rng.randrange(cluster)) for i in range(10000)]
+        def Hover(arg):
+            for point in points:
+                graph.GetObjectUnderMouse(point)
+        self.Measure('cluster hover', node_count, len(points), Hover, split_cells = len(graph.grid.splitCells))
+        probe = Node(graph, 2, 1)
+        def Validate(arg):
+            for point in points:
+                probe.pos = point
+                graph.IsValidNodePosition(probe)
+        self.Measure('cluster validity', node_count, len(points), Validate)
+
+    def BenchmarkRender(self, graph:Graph, node_count:int):
+        try:
+            from PyQt5.QtGui import QImage, QPainter, QColor
+            from PyQt5.QtWidgets import QApplication
+        except ImportError:
+            print('PyQt5 is not installed, render is skipped', file=sys.stderr)
+            return
+        #scene backend is part of widgets module, so application has to be widget one
+        if QApplication.instance() == None:
+            self.app = QApplication(sys.argv[:1])
+        width = min(graph.width, 1920)
+        height = min(graph.height, 1080)
+        image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+        def Render(rect):
+            image.fill(QColor('white'))
+            painter = QPainter(image)
+            graph.RenderGrid(painter, rect)
+            graph.Render(painter, rect)
+            painter.end()
+        #whole graph (painter clips what is outside image) and only visible part
+        self.Measure('Render', node_count, 1, Render, lambda: None, image = [width, height])
+        self.Measure('Render visible', node_count, 1, Render, lambda: (0, 0, width, height), image = [width, height])
+
+        #zoomed out view - level of detail, only visible part
+        def RenderZoomed(zoom):
+            image.fill(QColor('white'))
+            painter = QPainter(image)
+            painter.scale(zoom, zoom)
+            graph.Render(painter, (0, 0, int(width / zoom), int(height / zoom)), zoom)
+            painter.end()
+        for name, zoom in (('Render points', 0.3), ('Render density', 0.1)):
+            self.Measure(name, node_count, 1, RenderZoomed, lambda: zoom, image = [width, height], zoom = zoom)
+
+        self.BenchmarkScene(graph, node_count, Render, (width, height))
+
+    #the same render and picking through QGraphicsScene backend (see GraphScene), compared with painting above
+    def BenchmarkScene(self, graph:Graph, node_count:int, render, image_size:tuple[int, int]):
+        import GraphScene
+        self.Measure('Scene build', node_count, node_count, lambda arg: graph.SetScene(GraphScene.GraphScene()), lambda: graph.SetScene(None))
+        self.Measure('Render visible (scene)', node_count, 1, render, lambda: (0, 0, *image_size), image = list(image_size))
+        points = GetRandomPoints(graph, 10000, random.Random(node_count))
+        def Hover(arg):
+            for point in points:
+                graph.GetObjectUnderMouse(point)
+        self.Measure('GetObjectUnderMouse (scene)', node_count, len(points), Hover)
+        #adding and removing node with its links keeps scene in sync incrementally
+        nodes = list(graph.nodes)[:200]
+        def Sync(arg):
+            for node in nodes:
+                links = list(graph.adjacency[node])
+                graph.RemoveNode(node)
+                graph.AddNode(node)
+                graph.AddLinks(links)
+            graph.TakeDirtyRects()
+        self.Measure('add/remove (scene)', node_count, len(nodes), Sync)
+        self.Measure('add/remove', node_count, len(nodes), Sync, lambda: graph.SetScene(None))
+
+    def BenchmarkFillComparison(self, width:int, height:int):
+        def Setup():
+            graph = Graph(width, height)
+            #some nodes already exist, so part of lattice is rejected
+            graph.CreateNode(Vector2d(width // 2, height // 2))
+            return graph
+        self.Measure('FillWindow per node', 0, 1, FillWindowPerNode, Setup, window = [width, height])
+        self.Measure('FillWindow bulk', 0, 1, Graph.FillWindow, Setup, window = [width, height])
+
+    #loading of binary graph file (see GraphFile) - lattice of nodes, every node linked to the next one
+    #file is written from arrays directly, building such graph node by node would take longer than loading it
+    def BenchmarkFile(self, node_count:int, path:str):
+        import GraphFile
+        if not GraphFile.available:
+            return
+        np = GraphFile.np
+        columns = GetLatticeColumns(node_count)
+        width, height = GetLatticeSize(node_count)
+        margin = Node.defaultWidth//2
+        indices = np.arange(node_count)
+        GraphFile.WriteColumns(path, width, height, {
+            'x' : indices % columns * (Node.defaultWidth + margin) + margin,
+            'y' : indices // columns * (Node.defaultHeight + margin) + margin,
+            'width' : np.full(node_count, Node.defaultWidth), 'height' : np.full(node_count, Node.defaultHeight),
+            'color' : indices % len(colors),
+            'first' : indices[:-1], 'second' : indices[1:]})
+        size = os.path.getsize(path)
+        #graph can be shown after first chunk in streaming mode
+        self.Measure('load first chunk', node_count, 1, lambda reader: reader.ReadChunk(65536), lambda: GraphFile.GraphReader(path))
+        repeats = self.repeats
+        self.repeats = 1
+        self.Measure('load file', node_count, node_count, lambda arg: GraphFile.Load(path), links = node_count - 1, file_bytes = size)
+        self.repeats = repeats
+        graph = GraphFile.Load(path)
+        self.Measure('save file', node_count, node_count, lambda arg: GraphFile.Save(graph, path))
+        os.remove(path)
+
+    #import of edge list CSV (see Importer) - chain of nodes without coordinates, every edge also listed reversed
+    def BenchmarkEdgeList(self, edge_count:int, path:str):
+        import Importer
+        with open(path, 'w') as file:
+            file.write('source,target\n')
+            for i in range(edge_count // 2):
+                file.write(f'n{i},n{i + 1}\nn{i + 1},n{i}\n')
+        size = os.path.getsize(path)
+        width, height = GetLatticeSize(edge_count // 2 + 1)
+        repeats = self.repeats
+        self.repeats = 1
+        self.Measure('import edge list', edge_count // 2 + 1, edge_count, lambda arg: Importer.Import(path, width, height), file_bytes = size)
+        self.repeats = repeats
+        os.remove(path)
+
+    #memory taken by node and link objects themselves (not by graph indices) - chain of nodes on lattice
+    #lists holding objects are created before measuring, so only objects are counted
+    def BenchmarkMemory(self, node_count:int):
+        import tracemalloc
+        width, height = GetLatticeSize(node_count)
+        graph = Graph(width, height, False, False)
+        xs, ys = graph.GetLatticePositions((0, 0, width, height))
+        positions = list(zip(xs, ys))[:node_count]
+        nodes = [None] * node_count
+        links = [None] * (node_count - 1)
+        tracemalloc.start()
+        for index, (x, y) in enumerate(positions):
+            node = Node(graph)
+            node.pos = Vector2d(x, y)
+            nodes[index] = node
+        node_bytes = tracemalloc.get_traced_memory()[0]
+        for index in range(node_count - 1):
+            links[index] = Link(nodes[index], nodes[index + 1])
+        link_bytes = tracemalloc.get_traced_memory()[0] - node_bytes
+        tracemalloc.stop()
+        self.results.append({'operation' : 'memory', 'nodes' : node_count, 'count' : node_count,
+                             'bytes_per_node' : node_bytes / node_count, 'bytes_per_link' : link_bytes / (node_count - 1)})
+        print(f'{"memory":>20} {node_count:>7} nodes: {node_bytes / node_count:.1f} bytes per node, {link_bytes / (node_count - 1):.1f} bytes per link', file=sys.stderr)
+
+    #tiled image export (see Export) with growing number of worker processes, up to all cores
+    def BenchmarkExport(self, graph:Graph, node_count:int, path:str):
+        import Export
+        workers = 1
+        counts = []
+        while workers < (os.cpu_count() or 1):
+            counts.append(workers)
+            workers *= 2
+        counts.append(os.cpu_count() or 1)
+        repeats = self.repeats
+        self.repeats = 1
+        for workers in counts:
+            self.Measure(f'export {workers} workers', node_count, 1, lambda arg: Export.Export(graph, path, 1, 1024, workers),
+                         workers = workers, image = [graph.width, graph.height])
+        self.repeats = repeats
+        os.remove(path)
+
+    #autosave (see Journal) - cost of edits for ui thread, compaction and restore of snapshot with journal of moves
+    def BenchmarkJournal(self, node_count:int, directory:str):
+        import shutil
+        import Journal
+        graph = CreateSyntheticGraph(node_count, 1.0, random.Random(1))
+        nodes = list(graph.nodes)
+        journal = Journal.Journal(directory)
+        journal.Start(graph)
+        self.Measure('journal moves', node_count, node_count, lambda arg: [journal.MoveNode(node) for node in nodes])
+        self.Measure('journal compact', node_count, node_count, lambda arg: journal.Compact())
+        #journal with every node moved twice after snapshot
+        for node in nodes + nodes:
+            journal.MoveNode(node)
+        journal.Close()
+        self.Measure('journal restore', node_count, node_count * 2, lambda arg: Journal.Journal(directory).Restore(), links = len(graph.links))
+        shutil.rmtree(directory)
+
+    #import time of module in fresh interpreter, also reports whether importing it pulled in Qt
+    def BenchmarkImport(self, module:str):
+        code = ('import sys, time\n'
+                'start = time.perf_counter()\n'
+                f'import {module}\n'
+                'print(time.perf_counter() - start, "PyQt5" in sys.modules)')
+        #modules are found next to this file, wherever benchmark is started from
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+        elapsed = float(output[0])
+        loads_qt = output[1] == 'True'
+        self.results.append({'operation' : 'import ' + module, 'nodes' : 0, 'count' : 1,
+                             'total_ms' : elapsed * 1000, 'per_op_us' : elapsed * 1e6, 'loads_qt' : loads_qt})
+        print(f'{"import " + module:>20}: {elapsed * 1000:.1f} ms, loads Qt: {loads_qt}', file=sys.stderr)
+
+def GetCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of graph operations')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='node counts of synthetic graphs')
+    parser.add_argument('--link-density', type=float, default=1.0, help='average number of links per node')
+    parser.add_argument('--repeats', type=int, default=3, help='runs of every operation, best one is reported')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--file-nodes', type=int, default=1000000, help='node count of binary file load benchmark (0 - skip it)')
+    parser.add_argument('--export-nodes', type=int, default=200000, help='node count of image export benchmark (0 - skip it)')
+    parser.add_argument('--memory-nodes', type=int, default=1000000, help='node count of memory benchmark (0 - skip it)')
+    parser.add_argument('--import-edges', type=int, default=1000000, help='edge count of edge list import benchmark (0 - skip it)')
+    parser.add_argument('--journal-nodes', type=int, default=100000, help='node count of autosave journal benchmark (0 - skip it)')
+    parser.add_argument('--output', help='file for JSON results (stdout by default)')
+    args = parser.parse_args()
+
+    suite = Suite(args.repeats)
+    #model layer, optional array store (numpy) and Qt layer on top of them
+    for module in ('GraphObjects', 'NodeStore', 'GraphQt'):
+        suite.BenchmarkImport(module)
+    suite.BenchmarkFillComparison(1920, 1080)
+    suite.BenchmarkCluster(10000, args.seed)
+    for size in args.sizes:
+        suite.BenchmarkGraph(size, args.link_density, args.seed)
+    if args.file_nodes:
+        suite.BenchmarkFile(args.file_nodes, 'benchmark_graph.bin')
+    if args.export_nodes:
+        suite.BenchmarkExport(CreateSyntheticGraph(args.export_nodes, args.link_density, random.Random(args.seed)), args.export_nodes, 'benchmark_export.png')
+    if args.memory_nodes:
+        suite.BenchmarkMemory(args.memory_nodes)
+    if args.import_edges:
+        suite.BenchmarkEdgeList(args.import_edges, 'benchmark_edges.csv')
+    if args.journal_nodes:
+        suite.BenchmarkJournal(args.journal_nodes, 'benchmark_autosave')
+
+    report = {'commit' : GetCommit(), 'python' : platform.python_version(), 'platform' : platform.platform(),
+              'link_density' : args.link_density, 'seed' : args.seed, 'results' : suite.results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+
+
+if __name__ == '__main__':
+    main()
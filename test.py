@@ -1,9 +1,21 @@
 from Utils import *
 from GraphObjects import *
-from PyQt5.QtGui import QMouseEvent
+from GraphQt import *
+from Profiler import Profiler
+from Recorder import Recorder
+from Viewport import Viewport
+import GraphFile
+import GraphQt
+import GraphScene
+import Export
+import Importer
+import Journal
+import Layout
+from PyQt5.QtGui import QColorConstants, QKeyEvent, QMouseEvent, QPainter, QPixmap, QRegion, QWheelEvent
 from PyQt5.QtWidgets import QApplication, QMainWindow
-from PyQt5.QtCore import QEvent, QObject, QRectF, QTimer
+from PyQt5.QtCore import QEvent, QObject, QRect, QRectF, Qt, QTimer
 import sys
+import time
 
 
 class Example(QMainWindow):
@@ -12,12 +24,59 @@ class Example(QMainWindow):
     hint_height = 50
     hint_margin = 10
     hint_text = 'Double click to create node'
+    #graph updates and repaints per second
+    frame_rate = 60
+    #height of profiler overlay (it replaces fps text when profiling is on)
+    overlay_height = 320
+    #files for profiler export
+    profile_json = 'profile.json'
+    profile_csv = 'profile.csv'
+    #file for recorded input session (see Recorder)
+    session_file = 'session.rec'
+    #graph saved by 'v' and loaded by 'o' (see GraphFile)
+    graph_file = 'graph.bin'
+    #whole graph exported by 'k' as image (see Export) - scale is image pixels per graph unit
+    export_file = 'graph.png'
+    export_scale = 1
+    #topology export imported by 'i' - edge list CSV or GraphML (see Importer)
+    import_file = 'import.csv'
+    #autosave - edits are journaled to this directory, graph is restored from it on start (see Journal)
+    journal_dir = 'autosave'
+    #how often journal is checked for writer errors and compaction (ms)
+    journal_check_interval = 1000
+    #nodes or links read per step of loading - graph is shown and can be edited between steps
+    load_chunk = 10000
+    #size of canvas - window shows part of it, LMB drag on empty space pans, wheel zooms
+    world_width = 8000
+    world_height = 8000
+    #zoom change per wheel step
+    zoom_step = 1.25
+    #hops from node under mouse highlighted by 'b'
+    bfs_depth = 3
+    #more dirty rects than this repaint whole window
+    max_dirty_rects = 256
+    #auto-layout ('l') - how often positions computed in background are applied and how long one apply may take
+    layout_rate = 30
+    layout_budget = 0.008
+    #moved nodes are shown not more often than this (seconds) - repainting big graph costs more than moving its nodes
+    layout_refresh_interval = 0.25
+    #passes over all nodes after layout finished - nodes blocked by not yet moved ones get another chance
+    layout_final_passes = 5
 
     def __init__(self):
         super().__init__()
+        #graph knows nothing about window - it lives in world coordinates, viewport maps them to window
+        self.graph: Graph = Graph(self.world_width, self.world_height)
+        #created before window - its size is updated on resize
+        self.viewport = Viewport()
+        #input session recording, 'r' starts and stops it
+        self.recorder = Recorder()
         self.initUI()
-        self.graph: Graph = Graph(self)
+        #mouse positions are in window coordinates
         self.current_mouse_pos: Vector2d = None
+        #latest mouse position not processed by frame yet
+        self.pending_mouse_pos: Vector2d = None
+        self.scheduler = FrameScheduler(self.ProcessFrame, self.frame_rate)
         QApplication.instance().installEventFilter(self)
 
         #binding input event functions to input processor
@@ -35,12 +94,274 @@ class Example(QMainWindow):
         self.fpsText = ''
         self.fpsPos = Vector2d(0,0)
 
+        #area of hint frame painted last time - it has to be cleared on next repaint
+        self.hintBounds = None
+
+        #grid and static figures rendered once, rebuilt only when they change, view is moved or window is resized
+        self.background: QPixmap = None
+        self.backgroundVersion = -1
+        self.backgroundViewVersion = -1
+        #last mouse position while panning view
+        self.panPos: Vector2d = None
+
+        #auto-layout running in background process
+        self.layoutWorker: Layout.LayoutWorker = None
+        self.layoutNodes = []
+        self.layoutPositions = None
+        #next node to apply and number of nodes moved during current pass over all nodes
+        self.layoutIndex = 0
+        self.layoutMoved = 0
+        self.layoutFinalPasses = 0
+        self.layoutRefreshTime = 0
+        self.layoutTimer = QTimer()
+        self.layoutTimer.setInterval(1000 // self.layout_rate)
+        self.layoutTimer.timeout.connect(self.ApplyLayout)
+
+        #topology queries on node under mouse: 'c' component, 'b' nearby nodes, 's' twice - shortest path, 'd' degrees, 'x' clears
+        #first node of path waiting for the second one
+        self.pathStart: Node = None
+        #result of last query or loading progress, shown instead of hint text
+        self.statusText = ''
+
+        #file being loaded or imported step by step, steps run when there is no input to process
+        #reader is GraphFile.GraphReader or Importer.GraphImporter - both fill new graph by chunks
+        self.reader = None
+        self.readerFile = ''
+        self.loadTimer = QTimer()
+        self.loadTimer.setInterval(0)
+        self.loadTimer.timeout.connect(self.LoadStep)
+
+        #image export running in worker processes, checked on timer until it is finished
+        self.export: Export.ImageExport = None
+        self.exportTimer = QTimer()
+        self.exportTimer.setInterval(50)
+        self.exportTimer.timeout.connect(self.ExportStep)
+
+        #rendering backend, 'g' switches between painting figures directly and QGraphicsScene (see GraphScene)
+        self.useScene = False
+
+        #frame phases timing, 'p' toggles it, 'e' exports collected timings
+        self.profiler = Profiler()
+
+        #every edit is journaled in background, graph of previous run (even crashed one) is restored here
+        self.journal: Journal.Journal = None
+        self.journalTimer = QTimer()
+        self.journalTimer.setInterval(self.journal_check_interval)
+        self.journalTimer.timeout.connect(self.CheckJournal)
+        if Journal.available:
+            self.StartJournal()
+
     def updateFPSText(self):
-        self.fpsText = 'FPS:' + str(self.frameCount)
-        if self.previousFPS != self.frameCount: #just for the sake of beautiful "0" in top left corner))
-            self.Refresh()
+        stats = self.scheduler.TakeStats()
+        self.fpsText = 'FPS:' + str(self.frameCount) + '\nevents:' + str(stats['events']) + '  coalesced:' + str(stats['coalesced']) + '  dropped:' + str(stats['dropped'])
+        if self.profiler.enabled:
+            self.fpsText += '\n' + self.GetProfilerText()
+        if self.previousFPS != self.frameCount or self.profiler.enabled: #just for the sake of beautiful "0" in top left corner))
+            self.update(QRect(self.fpsPos.x, self.fpsPos.y, self.hint_width, self.overlay_height))
         self.frameCount = 0
 
+    def GetProfilerText(self):
+        summary = self.profiler.GetSummary()
+        lines = ['nodes: ' + str(len(self.graph.nodes)) + '  links: ' + str(len(self.graph.links))]
+        for phase, stats in summary.items():
+            lines.append(f'{phase}: {stats["p50"]:.2f} / {stats["p95"]:.2f} / {stats["p99"]:.2f} ms')
+        return 'p50 / p95 / p99\n' + '\n'.join(lines)
+
+    def SetProfiling(self, enabled:bool):
+        if enabled:
+            self.profiler.Instrument(Example, 'paintEvent', 'Frame')
+            self.profiler.Instrument(Graph, 'ProcessInput')
+            self.profiler.Instrument(Example, 'GetBackground', 'Background')
+            self.profiler.Instrument(Graph, 'RenderGrid')
+            self.profiler.Instrument(GraphQt, 'RenderLinks')
+            self.profiler.Instrument(GraphQt, 'RenderNodes')
+            self.profiler.Instrument(GraphQt, 'RenderNodePoints')
+            self.profiler.Instrument(GraphQt, 'RenderDensity')
+            self.profiler.Instrument(GraphScene.GraphScene, 'Render', 'RenderScene')
+            self.profiler.Instrument(Graph, 'RenderActive')
+            self.profiler.Instrument(Layout, 'ApplyPositions', 'Layout')
+            self.profiler.Instrument(Example, 'DrawFPS')
+            self.profiler.Instrument(Graph, 'RenderHint')
+        else:
+            self.profiler.Disable()
+            self.profiler.Clear()
+        self.updateFPSText()
+
+    def ExportProfile(self):
+        self.profiler.ExportJSON(self.profile_json, {'nodes' : len(self.graph.nodes), 'links' : len(self.graph.links)})
+        self.profiler.ExportCSV(self.profile_csv)
+
+    def StartJournal(self):
+        self.journal = Journal.Journal(self.journal_dir)
+        try:
+            start = time.perf_counter()
+            graph = self.journal.Restore()
+            if graph != None:
+                self.graph = graph
+                self.statusText = f'restored {len(graph.nodes)} nodes, {len(graph.links)} links ({time.perf_counter() - start:.2f} s)'
+            self.journal.Start(self.graph)
+        except (OSError, ValueError) as error:
+            CreateWarningMessage('Autosave is off', str(error))
+            self.journal = None
+            return
+        self.journalTimer.start()
+
+    #compaction only copies columns kept by journal, writer thread makes snapshot of them
+    def CheckJournal(self):
+        if self.journal.error != None:
+            CreateWarningMessage('Autosave is off', str(self.journal.error))
+            self.journal.Close()
+            self.journal = None
+            self.journalTimer.stop()
+        elif self.journal.NeedsCompaction():
+            self.journal.Compact()
+
+    def closeEvent(self, event):
+        if self.journal != None:
+            self.journal.Close()
+        super().closeEvent(event)
+
+    #layout and loading change graph without input, replay of session recorded during them would diverge
+    #so recording doesn't start while they run and is stopped when they start
+    def SetRecording(self, enabled:bool):
+        if enabled:
+            if self.reader != None or self.layoutWorker != None:
+                return
+            self.recorder.Start(self.graph)
+        else:
+            self.recorder.Stop(self.graph, self.session_file)
+
+    def SaveGraph(self):
+        if GraphFile.available and self.reader == None:
+            GraphFile.Save(self.graph, self.graph_file)
+            self.statusText = f'saved {len(self.graph.nodes)} nodes, {len(self.graph.links)} links'
+            self.update()
+
+    #replaces graph with empty one from file and fills it in steps (see LoadStep)
+    def LoadGraph(self):
+        if not GraphFile.available or self.reader != None:
+            return
+        try:
+            reader = GraphFile.GraphReader(self.graph_file)
+        except (OSError, ValueError) as error:
+            CreateWarningMessage('Graph is not loaded', str(error))
+            return
+        self.StartReading(reader, self.graph_file)
+
+    #same as LoadGraph, but for topology export - nodes without coordinates are placed by importer
+    def ImportGraph(self):
+        if self.reader != None:
+            return
+        try:
+            reader = Importer.GraphImporter(self.import_file, self.world_width, self.world_height)
+        except OSError as error:
+            CreateWarningMessage('Graph is not imported', str(error))
+            return
+        self.StartReading(reader, self.import_file)
+
+    def StartReading(self, reader, file:str):
+        #old graph can't be replayed, edited by layout or queried anymore
+        if self.recorder.recording:
+            self.SetRecording(False)
+        self.StopLayout()
+        self.pathStart = None
+        self.reader = reader
+        self.readerFile = file
+        self.graph = reader.graph
+        #scene is filled as chunks arrive
+        if self.useScene:
+            self.graph.SetScene(GraphScene.GraphScene())
+        self.backgroundVersion = -1
+        self.loadTimer.start()
+
+    def LoadStep(self):
+        try:
+            finished = self.reader.ReadChunk(self.load_chunk)
+        except (ValueError, SyntaxError) as error:
+            #broken file - what is read so far stays
+            CreateWarningMessage('Graph is not read completely', str(error))
+            finished = True
+        if finished:
+            self.statusText = f'loaded {len(self.graph.nodes)} nodes, {len(self.graph.links)} links'
+            self.reader = None
+            self.loadTimer.stop()
+            #loaded graph replaces journaled one only when it is complete
+            if self.journal != None:
+                self.journal.Start(self.graph)
+        else:
+            self.statusText = f'loading {self.readerFile}: {self.reader.GetProgress() * 100:.0f}%'
+        self.update()
+
+    #export renders copy of graph taken here, so graph can be edited, laid out or replaced while it runs
+    def ExportImage(self):
+        if not Export.available or self.export != None or self.reader != None:
+            return
+        self.export = Export.ImageExport(self.graph, self.export_file, self.export_scale)
+        self.exportTimer.start()
+        self.ExportStep()
+
+    def ExportStep(self):
+        try:
+            finished = self.export.Step()
+        except Exception as error:
+            CreateWarningMessage('Image is not exported', str(error))
+            finished = True
+        if finished:
+            self.statusText = f'exported {len(self.export.files)} file(s): {self.export.files[0] if self.export.files else ""}'
+            self.export = None
+            self.exportTimer.stop()
+        else:
+            self.statusText = f'exporting {self.export_file}: {self.export.GetProgress() * 100:.0f}%'
+        self.update()
+
+    def SetSceneBackend(self, enabled:bool):
+        self.useScene = enabled
+        start = time.perf_counter()
+        self.graph.SetScene(GraphScene.GraphScene() if enabled else None)
+        self.statusText = f'{"scene" if enabled else "painter"} backend ({(time.perf_counter() - start) * 1000:.1f} ms)'
+        self.update()
+
+    def StartLayout(self):
+        if not Layout.available or len(self.graph.nodes) == 0 or self.reader != None:
+            return
+        if self.recorder.recording:
+            self.SetRecording(False)
+        self.layoutNodes, layout = Layout.CreateLayout(self.graph)
+        self.layoutWorker = Layout.LayoutWorker(layout)
+        self.layoutPositions = None
+        self.layoutIndex = 0
+        self.layoutMoved = 0
+        self.layoutFinalPasses = 0
+        self.layoutWorker.Start()
+        self.layoutTimer.start()
+
+    def StopLayout(self):
+        if self.layoutWorker != None:
+            self.layoutWorker.Stop()
+            self.layoutWorker = None
+        self.layoutTimer.stop()
+
+    #applies latest positions from layout, limited by time budget - the rest is applied on next ticks
+    def ApplyLayout(self):
+        positions = self.layoutWorker.TakePositions()
+        if positions != None:
+            self.layoutPositions = positions
+        if self.layoutPositions == None:
+            return
+        moved, self.layoutIndex = Layout.ApplyPositions(self.graph, self.layoutNodes, *self.layoutPositions, self.layoutIndex, self.layout_budget)
+        self.layoutMoved += moved
+        if self.layoutIndex >= len(self.layoutNodes):
+            if not self.layoutWorker.IsRunning():
+                self.layoutFinalPasses += 1
+                if self.layoutMoved == 0 or self.layoutFinalPasses >= self.layout_final_passes:
+                    self.StopLayout()
+            self.layoutIndex = 0
+            self.layoutMoved = 0
+        now = time.perf_counter()
+        if self.layoutWorker == None or now - self.layoutRefreshTime >= self.layout_refresh_interval:
+            self.layoutRefreshTime = now
+            self.Refresh()
+
     def initUI(self):
         self.setGeometry(300, 300, 900, 600)
         self.setMinimumSize(300, 300)
@@ -48,53 +369,239 @@ class Example(QMainWindow):
         self.show()
         
     def DrawHint(self, painter:QPainter):
-        hint_rect = QRectF(self.hint_margin, self.height() - self.hint_height, self.hint_width, self.hint_height)
-        DrawText(self.hint_text, painter, hint_rect, Qt.AlignLeft | Qt.AlignBottom, 20, QColorConstants.DarkGray)
+        #query results are longer than hint, so text may take whole width of window
+        hint_rect = QRectF(self.hint_margin, self.height() - self.hint_height, self.width() - self.hint_margin * 2, self.hint_height)
+        DrawText(self.statusText or self.hint_text, painter, hint_rect, Qt.AlignLeft | Qt.AlignBottom, 20, QColorConstants.DarkGray)
 
+        self.hintBounds = None
         if self.current_mouse_pos:
-            self.graph.RenderHint(painter, self.current_mouse_pos)
+            if self.graph.RenderHint(painter, self.GetWorldPos(self.current_mouse_pos), self.current_mouse_pos):
+                self.hintBounds = GetTextFrameBounds(self.current_mouse_pos)
 
     def DrawFPS(self, painter:QPainter):
-        fps_rect = QRectF(self.fpsPos.x, self.fpsPos.y, self.hint_width, self.hint_height)
+        fps_rect = QRectF(self.fpsPos.x, self.fpsPos.y, self.hint_width, self.overlay_height if self.profiler.enabled else self.hint_height)
         DrawText(self.fpsText, painter, fps_rect, Qt.AlignLeft | Qt.AlignTop, 15, QColorConstants.DarkGray)
 
     def paintEvent(self, event):
+        self.frameCount+=1
         qp = QPainter()
         qp.begin(self)
 
-        self.graph.RenderGrid(qp)
-        self.graph.Render(qp)
+        #only part of window may need repaint (see Refresh)
+        rect = event.rect()
+        qp.drawPixmap(rect, self.GetBackground(), rect)
+        rect = (rect.x(), rect.y(), rect.width(), rect.height())
+        qp.save()
+        self.ApplyViewport(qp)
+        self.graph.RenderActive(qp, self.viewport.ToWorldRect(rect))
+        qp.restore()
         self.DrawFPS(qp)
         self.DrawHint(qp)
 
         qp.end()
 
+    def resizeEvent(self, event):
+        self.viewport.SetSize(self.width(), self.height())
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event: QWheelEvent):
+        pos = event.pos()
+        self.viewport.ZoomAt(self.zoom_step ** (event.angleDelta().y() / 120), pos.x(), pos.y())
+        self.update()
+
+    #painter draws in world coordinates after this
+    def ApplyViewport(self, painter:QPainter):
+        painter.scale(self.viewport.zoom, self.viewport.zoom)
+        painter.translate(-self.viewport.offsetX, -self.viewport.offsetY)
+
+    def GetWorldPos(self, pos:Vector2d):
+        if pos == None:
+            return None
+        return self.viewport.ToWorld(pos.x, pos.y)
+
+    def GetBackground(self):
+        if self.background == None or self.background.size() != self.size() * self.devicePixelRatioF() or self.backgroundVersion != self.graph.staticVersion or self.backgroundViewVersion != self.viewport.version:
+            self.background = QPixmap(self.size() * self.devicePixelRatioF())
+            self.background.setDevicePixelRatio(self.devicePixelRatioF())
+            self.background.fill(self.palette().window().color())
+            painter = QPainter(self.background)
+            self.ApplyViewport(painter)
+            #only visible part of graph is rendered, with details depending on zoom
+            rect = self.viewport.GetVisibleRect()
+            if self.viewport.zoom >= Graph.densityZoom:
+                self.graph.RenderGrid(painter, rect)
+            self.graph.RenderStatic(painter, rect, self.viewport.zoom)
+            painter.end()
+            self.backgroundVersion = self.graph.staticVersion
+            self.backgroundViewVersion = self.viewport.version
+        return self.background
+
+    #input is only queued here and processed once per frame (see ProcessFrame)
     def ProcessGraphInput(self, event: QMouseEvent):
-        if self.graph.ProcessInput(event):
+        graph_event = ConvertMouseEvent(event)
+        if graph_event == None or self.ProcessViewInput(graph_event):
+            return
+        pos = self.viewport.ToWorld(graph_event.x, graph_event.y)
+        graph_event.x = pos.x
+        graph_event.y = pos.y
+        self.scheduler.Push(graph_event)
+
+    #panning by dragging LMB on empty space, returns True if event is used by view
+    def ProcessViewInput(self, event: MouseEvent):
+        if event.type == MouseEvent.Press and event.button == MouseEvent.LeftButton:
+            if self.graph.GetObjectUnderMouse(self.viewport.ToWorld(event.x, event.y), Node) == None:
+                self.panPos = Vector2d(event.x, event.y)
+                return True
+        elif self.panPos != None:
+            if event.type == MouseEvent.Move:
+                self.viewport.Pan(event.x - self.panPos.x, event.y - self.panPos.y)
+                self.panPos = Vector2d(event.x, event.y)
+                self.update()
+                return True
+            if event.type == MouseEvent.Release and event.button == MouseEvent.LeftButton:
+                self.panPos = None
+                return True
+        return False
+
+    #fills visible part of world with nodes
+    def FillView(self):
+        rect = self.viewport.GetVisibleRect()
+        left = max(rect[0], 0)
+        top = max(rect[1], 0)
+        right = min(rect[0] + rect[2], self.graph.width)
+        bottom = min(rect[1] + rect[3], self.graph.height)
+        if right > left and bottom > top:
+            self.recorder.AddFill((left, top, right - left, bottom - top))
+            self.graph.FillRegion((left, top, right - left, bottom - top))
+            self.Refresh()
+
+    def GetNodeUnderMouse(self):
+        return self.graph.GetObjectUnderMouse(self.GetWorldPos(self.current_mouse_pos), Node)
+
+    def ShowQueryResult(self, text:str, nodes:list[Node], links:list[Link], start:float):
+        self.statusText = f'{text} ({(time.perf_counter() - start) * 1000:.1f} ms)'
+        self.graph.SetHighlight(nodes, links)
+        self.Refresh()
+
+    #runs topology query for key, nothing happens without numpy or when query needs node and mouse is not over one
+    def RunQuery(self, key:str):
+        if key == 'x':
+            self.pathStart = None
+            self.statusText = ''
+            self.graph.SetHighlight([], [])
+            self.Refresh()
+            return
+        node = self.GetNodeUnderMouse()
+        if node == None and key != 'd':
+            return
+        start = time.perf_counter()
+        topology = self.graph.GetTopology()
+        if topology == None:
+            return
+        if key == 'c':
+            nodes, links = topology.GetComponent(topology.indices[node])
+            self.ShowQueryResult(f'component: {len(nodes)} nodes, {len(links)} links',
+                                 [topology.nodes[i] for i in nodes], [topology.links[i] for i in links], start)
+        elif key == 'b':
+            distances, via = topology.Bfs(topology.indices[node], self.bfs_depth)
+            reached = (distances > 0).nonzero()[0]
+            self.ShowQueryResult(f'{len(reached)} nodes within {self.bfs_depth} hops',
+                                 [topology.nodes[i] for i in reached] + [node], [topology.links[i] for i in via[reached]], start)
+        elif key == 's':
+            if self.pathStart == None or not self.pathStart in self.graph.nodes or self.pathStart == node:
+                self.pathStart = node
+                self.ShowQueryResult('path from selected node - press s over another node', [node], [], start)
+                return
+            path = topology.GetShortestPath(topology.indices[self.pathStart], topology.indices[node])
+            self.pathStart = None
+            if path == None:
+                self.ShowQueryResult('nodes are not connected', [], [], start)
+            else:
+                nodes, links = path
+                self.ShowQueryResult(f'shortest path: {len(links)} links',
+                                     [topology.nodes[i] for i in nodes], [topology.links[i] for i in links], start)
+        elif key == 'd':
+            stats = topology.GetDegreeStats()
+            #nodes with the most links are highlighted
+            hubs = (topology.GetDegrees() == stats['max']).nonzero()[0] if stats['max'] > 0 else []
+            self.ShowQueryResult(f'degree min {stats["min"]} max {stats["max"]} mean {stats["mean"]:.2f} median {stats["median"]:.0f}, isolated {stats["isolated"]}',
+                                 [topology.nodes[i] for i in hubs], [], start)
+
+    def ProcessFrame(self, events:list[MouseEvent]):
+        needs_refresh = False
+        #events are recorded as graph gets them (after coalescing), so replay reproduces the session exactly
+        for event in events:
+            self.recorder.AddMouse(event)
+            needs_refresh |= self.graph.ProcessInput(event)
+
+        if self.pending_mouse_pos:
+            self.recorder.AddHover(self.GetWorldPos(self.pending_mouse_pos))
+            #check for update or previous mouse position to update when mouse leaves figure area
+            #this way there is one more update to remove hint
+            needs_refresh |= self.graph.GetObjectUnderMouse(self.GetWorldPos(self.current_mouse_pos)) != None
+            self.current_mouse_pos = self.pending_mouse_pos
+            self.pending_mouse_pos = None
+
+        if needs_refresh:
             self.Refresh()
             
     def Refresh(self):
-        self.frameCount+=1
-        self.update()
+        rects = self.graph.TakeDirtyRects()
+        #merging many rects into region costs more than repainting whole window (e.g. after layout step)
+        if rects == None or len(rects) > self.max_dirty_rects:
+            self.update()
+            return
+        rects = [self.viewport.ToScreenRect(rect) for rect in rects]
+        #hint follows mouse, so its old and new areas are repainted too
+        if self.hintBounds:
+            rects.append(self.hintBounds)
+        if self.current_mouse_pos:
+            rects.append(GetTextFrameBounds(self.current_mouse_pos))
+        region = QRegion()
+        for rect in rects:
+            region = region.united(QRect(*rect))
+        self.update(region)
     
+    def keyReleaseEvent(self, event: QKeyEvent):
+        #held key sends release for every repeat, it would toggle modes and restart path selection over and over
+        if event.isAutoRepeat():
+            return
+        self.recorder.AddKey(event.text())
+        if event.text() == 'q':
+            self.FillView()
+        elif event.text() == 'p':
+            self.SetProfiling(not self.profiler.enabled)
+        elif event.text() == 'e':
+            self.ExportProfile()
+        elif event.text() == 'r':
+            self.SetRecording(not self.recorder.recording)
+        elif event.text() == 'v':
+            self.SaveGraph()
+        elif event.text() == 'o':
+            self.LoadGraph()
+        elif event.text() == 'i':
+            self.ImportGraph()
+        elif event.text() == 'k':
+            self.ExportImage()
+        elif event.text() == 'g':
+            self.SetSceneBackend(not self.useScene)
+        elif event.text() == 'l':
+            if self.layoutWorker != None:
+                self.StopLayout()
+            else:
+                self.StartLayout()
+        elif event.text() in ('c', 'b', 's', 'd', 'x'):
+            self.RunQuery(event.text())
+
     def eventFilter(self, source: QObject, event: QEvent) -> bool:
         if event.type() == QEvent.MouseMove:
             if event.button() == Qt.MouseButton.NoButton:
                 #any other events implemented here will result indoubling events because of 'update' or 'repaint'
                 #this one is safe though
+                #hover is checked once per frame for the latest position only
                 pos = event.pos()
-                
-                #check for update or previous mouse position to update when mouse leaves figure area
-                #this way there is one more update to remove hint
-                graph_needs_update = self.graph.GetObjectUnderMouse(self.current_mouse_pos)
-
-                self.current_mouse_pos = Vector2d(pos.x(), pos.y())
-                if graph_needs_update:
-                    self.Refresh()
-        if event.type() == QEvent.KeyRelease:
-            if event.text() == 'q':
-                self.graph.FillWindow()
-
+                self.pending_mouse_pos = Vector2d(pos.x(), pos.y())
+                self.scheduler.Wake()
         return super().eventFilter(source, event)
     
 